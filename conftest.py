@@ -0,0 +1,9 @@
+import pytest
+
+from yatube.test_runner import TEST_SETTINGS
+
+
+@pytest.fixture(autouse=True)
+def test_settings(settings):
+    for name, value in TEST_SETTINGS.items():
+        setattr(settings, name, value)
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Post, Group, Follow
 
 
@@ -9,6 +10,16 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по всей таблице - полнотекстовый индекс.
+        if not search.match_expression(search_term) or (
+            not search.is_supported()
+        ):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return search.filter_matching(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("title", "slug", "description")
@@ -0,0 +1,284 @@
+"""JSON API лент только для чтения: посты, сообщества, комментарии и
+лента подписок.
+
+Списки листаются теми же курсорами, что и HTML-страницы: ``?after=`` и
+``?before=`` принимают ``next_cursor``/``previous_cursor`` из ответа,
+``?limit=`` задаёт размер страницы (не больше ``MAX_LIMIT``).
+
+``?fields=id,text,author`` оставляет в ответе только перечисленные поля,
+и запрос читает только нужные им колонки (``only()``); автор и группа
+подтягиваются тем же запросом (``select_related``) и только если их
+спросили. Страница выбирается в представлении, как и у HTML-страниц, -
+её запросы видят бюджет и метрики, - а JSON отдаётся потоком по одной
+записи, без сборки всего ответа в памяти.
+"""
+import json
+from functools import wraps
+from operator import attrgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from .budget import query_budget
+from .models import Comment, Group, Post, User
+from .pagination import (
+    COMMENTS_PER_PAGE,
+    POSTS_PER_PAGE,
+    AscendingCursorPaginator,
+    CommentPaginator,
+    CursorPaginator,
+)
+from .timeline import TimelinePaginator
+
+MAX_LIMIT = 100
+CONTENT_TYPE = "application/json"
+
+
+class ApiError(Exception):
+    status = 400
+
+
+class Field:
+    """Поле ответа: как его взять из объекта, какие колонки оно читает
+    и какую связь подтянуть для него тем же запросом."""
+
+    def __init__(self, get, columns=(), related=None):
+        self.get = get
+        self.columns = (related, *columns) if related else tuple(columns)
+        self.related = related
+
+
+def _user(user):
+    return {"username": user.username, "name": user.get_full_name()}
+
+
+USER_COLUMNS = ("username", "first_name", "last_name")
+
+
+def _author_field():
+    return Field(
+        lambda obj: _user(obj.author),
+        [f"author__{column}" for column in USER_COLUMNS],
+        "author",
+    )
+
+
+def _group(post):
+    group = post.group
+    return group and {"slug": group.slug, "title": group.title}
+
+
+POST_FIELDS = {
+    "id": Field(attrgetter("id")),
+    "text": Field(attrgetter("text"), ["text"]),
+    "preview": Field(attrgetter("preview"), ["preview"]),
+    "pub_date": Field(attrgetter("pub_date"), ["pub_date"]),
+    "image": Field(
+        lambda post: post.image.url if post.image else None, ["image"]
+    ),
+    "comment_count": Field(attrgetter("comment_count"), ["comment_count"]),
+    "author": _author_field(),
+    "group": Field(_group, ["group__slug", "group__title"], "group"),
+}
+COMMENT_FIELDS = {
+    "id": Field(attrgetter("id")),
+    "post": Field(attrgetter("post_id"), ["post"]),
+    "text": Field(attrgetter("text"), ["text"]),
+    "created": Field(attrgetter("created"), ["created"]),
+    "author": _author_field(),
+}
+GROUP_FIELDS = {
+    "id": Field(attrgetter("id")),
+    "slug": Field(attrgetter("slug"), ["slug"]),
+    "title": Field(attrgetter("title"), ["title"]),
+    "description": Field(attrgetter("description"), ["description"]),
+}
+
+
+def requested_fields(request, spec):
+    """Поля из ``?fields=`` в порядке запроса; без параметра - все."""
+    raw = request.GET.get("fields", "")
+    names = list(dict.fromkeys(filter(None, map(str.strip, raw.split(",")))))
+    if not names:
+        return list(spec)
+    unknown = [name for name in names if name not in spec]
+    if unknown:
+        raise ApiError("Неизвестные поля: " + ", ".join(unknown))
+    return names
+
+
+def columns(spec, fields, keys=()):
+    """Колонки и связи для ``only()``/``select_related()``.
+
+    Ключи курсора читаются всегда: без них курсор страницы стоил бы
+    отдельного запроса на каждую запись.
+    """
+    names = dict.fromkeys(keys)
+    related = []
+    for name in fields:
+        names.update(dict.fromkeys(spec[name].columns))
+        if spec[name].related:
+            related.append(spec[name].related)
+    return list(names), related
+
+
+def shrink(queryset, spec, fields, keys=()):
+    only, related = columns(spec, fields, keys)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*only)
+
+
+def page_limit(request, default):
+    raw = request.GET.get("limit")
+    if raw is None:
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(f"limit - целое число от 1 до {MAX_LIMIT}")
+    return limit
+
+
+def serialize(obj, spec, fields):
+    return {name: spec[name].get(obj) for name in fields}
+
+
+def _dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _stream(page, spec, fields):
+    yield (
+        '{"next_cursor": %s, "previous_cursor": %s, "results": ['
+        % (_dumps(page.next_cursor), _dumps(page.previous_cursor))
+    )
+    for i, obj in enumerate(page):
+        yield ("," if i else "") + _dumps(serialize(obj, spec, fields))
+    yield "]}"
+
+
+def list_response(request, paginator, spec, fields):
+    page = paginator.get_cursor_page(
+        after=request.GET.get("after"), before=request.GET.get("before")
+    )
+    return StreamingHttpResponse(
+        _stream(page, spec, fields), content_type=CONTENT_TYPE
+    )
+
+
+def api_view(view):
+    """GET/HEAD; ошибки и 404 - JSON ``{"error": ...}``."""
+
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({"error": str(error)}, status=error.status)
+        except Http404:
+            return JsonResponse({"error": "Не найдено"}, status=404)
+
+    return wrapper
+
+
+def _post_list(request, queryset):
+    fields = requested_fields(request, POST_FIELDS)
+    paginator = CursorPaginator(
+        shrink(queryset, POST_FIELDS, fields, ("pub_date", "id")),
+        page_limit(request, POSTS_PER_PAGE),
+    )
+    return list_response(request, paginator, POST_FIELDS, fields)
+
+
+@query_budget(4)
+@api_view
+def posts(request):
+    return _post_list(request, Post.objects.all())
+
+
+@query_budget(5)
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only("id"), slug=slug)
+    return _post_list(request, Post.objects.filter(group=group))
+
+
+@query_budget(5)
+@api_view
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only("id"), username=username)
+    return _post_list(request, Post.objects.filter(author=author))
+
+
+@query_budget(6)
+@api_view
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Нужна авторизация"}, status=401)
+    fields = requested_fields(request, POST_FIELDS)
+    only, related = columns(POST_FIELDS, fields, ("pub_date", "id"))
+    queryset = shrink(
+        Post.objects.filter(author__following__user=request.user),
+        POST_FIELDS,
+        fields,
+        ("pub_date", "id"),
+    )
+    paginator = TimelinePaginator(
+        queryset,
+        page_limit(request, POSTS_PER_PAGE),
+        request.user,
+        related=related,
+        only=only,
+    )
+    return list_response(request, paginator, POST_FIELDS, fields)
+
+
+@query_budget(3)
+@api_view
+def post(request, post_id):
+    fields = requested_fields(request, POST_FIELDS)
+    post = get_object_or_404(
+        shrink(Post.objects.all(), POST_FIELDS, fields), id=post_id
+    )
+    return JsonResponse(
+        serialize(post, POST_FIELDS, fields),
+        json_dumps_params={"ensure_ascii": False},
+    )
+
+
+@query_budget(5)
+@api_view
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only("id"), id=post_id)
+    fields = requested_fields(request, COMMENT_FIELDS)
+    paginator = CommentPaginator(
+        shrink(
+            Comment.objects.filter(post=post).order_by("created", "id"),
+            COMMENT_FIELDS,
+            fields,
+            ("created", "id"),
+        ),
+        page_limit(request, COMMENTS_PER_PAGE),
+    )
+    return list_response(request, paginator, COMMENT_FIELDS, fields)
+
+
+@query_budget(4)
+@api_view
+def groups(request):
+    """Сообщества по адресу: слаг уникален и проиндексирован."""
+    fields = requested_fields(request, GROUP_FIELDS)
+    paginator = AscendingCursorPaginator(
+        shrink(
+            Group.objects.order_by("slug"), GROUP_FIELDS, fields, ("slug",)
+        ),
+        page_limit(request, POSTS_PER_PAGE),
+        keys=("slug",),
+    )
+    return list_response(request, paginator, GROUP_FIELDS, fields)
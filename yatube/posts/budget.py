@@ -0,0 +1,77 @@
+"""Бюджет SQL-запросов на одно представление.
+
+Представление объявляет потолок декоратором ``@query_budget(n)``.
+Бюджеты проверяют тесты (``posts/tests/test_queries.py``), а при
+``QUERY_BUDGET_CHECK`` ещё и ``QueryBudgetMiddleware``: при ``DEBUG``
+превышение роняет запрос, в остальных случаях пишется в лог.
+"""
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """Объявить максимальное число SQL-запросов для представления."""
+
+    def decorator(view):
+        view.query_budget = limit
+        return view
+
+    return decorator
+
+
+def get_budget(view):
+    return getattr(view, "query_budget", None)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+
+@contextmanager
+def count_queries(using=connection):
+    """Посчитать запросы внутри блока, даже при ``DEBUG = False``."""
+    counter = QueryCounter()
+    with using.execute_wrapper(counter):
+        yield counter
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_BUDGET_CHECK", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with count_queries() as counter:
+            response = self.get_response(request)
+        match = request.resolver_match
+        limit = get_budget(match.func) if match else None
+        if limit is not None and len(counter) > limit:
+            message = (
+                f"{match.view_name}: {len(counter)} SQL-запросов "
+                f"при бюджете {limit}"
+            )
+            if settings.DEBUG:
+                raise QueryBudgetExceeded(
+                    message + "\n" + "\n".join(counter.queries)
+                )
+            logger.warning(message)
+        return response
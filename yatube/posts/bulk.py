@@ -0,0 +1,290 @@
+"""Потоковые выгрузка и загрузка данных без ``dumpdata``/``loaddata``.
+
+``loaddata`` читает весь JSON в память и сохраняет объекты по одному, с
+сигналами. Здесь файл (JSON-массив в формате ``dumpdata`` или NDJSON -
+объект на строку) разбирается по кускам, объекты раскладываются по
+моделям во временные NDJSON-файлы и затем вставляются ``bulk_create``
+пачками в порядке зависимостей, каждая пачка - в своей транзакции.
+Производные данные (счётчики, ленты) пересчитываются в конце одним
+проходом, поисковый индекс обновляют его триггеры.
+
+Выгрузка пишет те же модели в том же порядке, пачками по первичному
+ключу, так что таблица целиком в памяти не оказывается.
+"""
+import json
+import os
+import shutil
+import tempfile
+from itertools import islice
+
+from django.apps import apps
+from django.core import serializers
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models.signals import post_save, pre_save
+
+from . import counters, timeline
+
+# Модели в порядке зависимостей: каждая ссылается только на предыдущие.
+MODELS = (
+    "auth.user",
+    "posts.group",
+    "posts.post",
+    "posts.comment",
+    "posts.follow",
+)
+# Поля, которых нет в выгрузках старых версий, и откуда их взять - так
+# же их заполнила миграция 0016.
+FALLBACKS = {
+    "posts.post": {"updated": "pub_date"},
+    "posts.comment": {"updated": "created"},
+}
+BATCH_SIZE = 1000
+READ_SIZE = 1 << 16
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def fill_missing(label, instances):
+    """Заполнить пустые поля из ``FALLBACKS``: ``insert_raw`` пишет
+    значения как есть, и ``auto_now`` их не подставит."""
+    for field, source in FALLBACKS.get(label, {}).items():
+        for obj in instances:
+            if getattr(obj, field) is None:
+                setattr(obj, field, getattr(obj, source))
+
+
+def insert_raw(model, objects, ignore_conflicts=False):
+    """``bulk_create`` без ``pre_save`` полей.
+
+    ``bulk_create`` вызывает ``pre_save``, и ``auto_now_add``/``auto_now``
+    затёрли бы даты из данных текущим временем. Здесь, как при
+    ``save(raw=True)`` у ``loaddata``, значения пишутся как есть; только
+    HTML и превью поста (``Post.prerender()``) пересчитываются по тексту.
+    """
+    if not objects:
+        return
+    # Производные поля, которые модель обычно считает в save().
+    if hasattr(model, "prerender"):
+        for obj in objects:
+            obj.prerender()
+    meta = model._meta
+    fields = [
+        field
+        for field in meta.concrete_fields
+        if field is not meta.auto_field
+        or all(obj.pk is not None for obj in objects)
+    ]
+    size = connection.ops.bulk_batch_size(fields, objects) or len(objects)
+    for start in range(0, len(objects), size):
+        model._base_manager._insert(
+            objects[start:start + size],
+            fields=fields,
+            raw=True,
+            ignore_conflicts=ignore_conflicts,
+        )
+
+
+def reset_sequences(models):
+    """Сдвинуть последовательности id после вставки с явными ключами."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def read_objects(stream):
+    """Объекты из JSON-массива или NDJSON, без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+    while True:
+        # Между объектами - пробелы, запятые и скобки массива.
+        while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+            position += 1
+        if position < len(buffer):
+            try:
+                obj, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield obj
+                position = end
+                continue
+        elif eof:
+            return
+        chunk = stream.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def write_objects(stream, objects, ndjson=True):
+    """Записать объекты как NDJSON или JSON-массив, по одному."""
+    separator = "\n" if ndjson else ",\n"
+    if not ndjson:
+        stream.write("[\n")
+    first = True
+    for obj in objects:
+        if not first:
+            stream.write(separator)
+        stream.write(
+            json.dumps(obj, cls=DjangoJSONEncoder, ensure_ascii=False)
+        )
+        first = False
+    stream.write("\n" if ndjson else "\n]\n")
+
+
+def export_objects(labels=MODELS, batch_size=BATCH_SIZE, progress=None):
+    """Объекты моделей в формате сериализатора ``python``, пачками по pk.
+
+    Пачки выбираются по ``pk > последний`` с ``prefetch_related`` для
+    many-to-many, чтобы сериализатор не делал запрос на каждый объект.
+    """
+    for label in labels:
+        model = apps.get_model(label)
+        m2m = [field.name for field in model._meta.many_to_many]
+        queryset = model._default_manager.order_by("pk").prefetch_related(
+            *m2m
+        )
+        last = None
+        while True:
+            batch = queryset
+            if last is not None:
+                batch = batch.filter(pk__gt=last)
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            last = batch[-1].pk
+            yield from serializers.serialize("python", batch)
+            if progress:
+                progress(label, len(batch))
+
+
+class Loader:
+    """Загрузка объектов пачками ``bulk_create`` в порядке ``MODELS``.
+
+    ``send_signals`` отправляет ``pre_save``/``post_save`` с ``raw=True``,
+    как ``loaddata``; по умолчанию сигналы не отправляются.
+    """
+
+    def __init__(
+        self,
+        batch_size=BATCH_SIZE,
+        send_signals=False,
+        ignore_conflicts=False,
+        progress=None,
+    ):
+        self.batch_size = batch_size
+        self.send_signals = send_signals
+        self.ignore_conflicts = ignore_conflicts
+        self.progress = progress
+        self.loaded = {}
+        self.skipped = {}
+
+    def load(self, stream):
+        spool = tempfile.mkdtemp(prefix="yatube_load_")
+        files = {}
+        try:
+            self._spool(stream, spool, files)
+            for label in MODELS:
+                if label not in files:
+                    continue
+                files[label].close()
+                with open(files[label].name, encoding="utf-8") as file:
+                    self._insert(label, (json.loads(line) for line in file))
+        finally:
+            for file in files.values():
+                file.close()
+            shutil.rmtree(spool, ignore_errors=True)
+        self._reset_sequences()
+        self._rebuild()
+        return self.loaded
+
+    def _spool(self, stream, spool, files):
+        """Разложить объекты по файлам моделей; прочие модели пропустить."""
+        for obj in read_objects(stream):
+            label = obj.get("model", "").lower()
+            if label not in MODELS:
+                self.skipped[label] = self.skipped.get(label, 0) + 1
+                continue
+            if label not in files:
+                files[label] = open(
+                    os.path.join(spool, f"{label}.ndjson"), "w",
+                    encoding="utf-8",
+                )
+            files[label].write(json.dumps(obj, ensure_ascii=False) + "\n")
+
+    def _insert(self, label, objects):
+        model = apps.get_model(label)
+        using = model._default_manager.db
+        for batch in _batches(objects, self.batch_size):
+            deserialized = list(
+                serializers.deserialize(
+                    "python", batch, ignorenonexistent=True
+                )
+            )
+            instances = [item.object for item in deserialized]
+            fill_missing(label, instances)
+            with transaction.atomic():
+                if self.send_signals:
+                    for instance in instances:
+                        pre_save.send(
+                            model, instance=instance, raw=True, using=using
+                        )
+                insert_raw(
+                    model, instances, ignore_conflicts=self.ignore_conflicts
+                )
+                self._insert_m2m(model, deserialized)
+                if self.send_signals:
+                    for instance in instances:
+                        post_save.send(
+                            model,
+                            instance=instance,
+                            created=True,
+                            raw=True,
+                            using=using,
+                            update_fields=None,
+                        )
+            self.loaded[label] = self.loaded.get(label, 0) + len(instances)
+            if self.progress:
+                self.progress(label, len(instances))
+
+    def _insert_m2m(self, model, deserialized):
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            source = field.m2m_field_name() + "_id"
+            target = field.m2m_reverse_field_name() + "_id"
+            rows = [
+                through(**{source: item.object.pk, target: pk})
+                for item in deserialized
+                for pk in item.m2m_data.get(field.name, ())
+            ]
+            through._default_manager.bulk_create(
+                rows, ignore_conflicts=self.ignore_conflicts
+            )
+
+    def _reset_sequences(self):
+        reset_sequences([apps.get_model(label) for label in self.loaded])
+
+    def _rebuild(self):
+        """Пересчитать то, что обычно поддерживают сигналы моделей."""
+        if not self.loaded:
+            return
+        with transaction.atomic():
+            counters.rebuild_users()
+            counters.rebuild_comments()
+        if self.loaded.get("posts.follow") or self.loaded.get("posts.post"):
+            timeline.rebuild()
+        # Поисковый индекс обновили триггеры. Страницы затронуты почти
+        # все, и сдвигать их теги по одному дороже, чем очистить кеш.
+        cache.clear()
@@ -0,0 +1,28 @@
+"""Проверки окружения при запуске (``manage.py check``, ``runserver``,
+``migrate``)."""
+import sqlite3
+
+from django.core import checks
+from django.db import connections
+
+# Подписки (posts/follows.py) - INSERT/DELETE ... RETURNING.
+SQLITE_MIN_VERSION = (3, 35)
+
+
+@checks.register(checks.Tags.compatibility)
+def check_sqlite_version(app_configs, **kwargs):
+    if sqlite3.sqlite_version_info >= SQLITE_MIN_VERSION:
+        return []
+    if not any(connections[alias].vendor == "sqlite" for alias in connections):
+        return []
+    required = ".".join(map(str, SQLITE_MIN_VERSION))
+    return [
+        checks.Error(
+            f"Нужен SQLite {required} или новее, "
+            f"установлен {sqlite3.sqlite_version}",
+            hint="Подписка и отписка (posts/follows.py) используют "
+            "INSERT/DELETE ... RETURNING; обновите libsqlite3 или "
+            "используйте PostgreSQL.",
+            id="posts.E001",
+        )
+    ]
@@ -0,0 +1,138 @@
+"""Условный GET (ETag / Last-Modified) для страниц поста, автора и группы.
+
+Валидаторы страницы считаются одним запросом с агрегатом по индексу:
+``max(updated)`` постов или комментариев плюс «версии», которые
+временем правки не выражаются - число комментариев, подписчиков и
+постов, имя автора, подписан ли читатель. Лента сообщества вместо имён
+учитывает время последней правки профилей авторов
+(``UserStats.profile_updated``). Совпали - ответ 304 без
+рендера. Декоратор стоит под ``cache_page_tagged``: страница из кеша
+хранит свои ETag и Last-Modified, и 304 на неё отдаётся без запросов.
+
+ETag учитывает и читателя: страница вошедшего пользователя отличается
+(ссылки, формы, кнопка подписки). Last-Modified отдаётся только
+анонимам: по нему одному нельзя отличить такие изменения.
+"""
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.db.models import Count, Exists, Max, OuterRef
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import Follow, Group, Post, User
+
+STATS = (
+    "stats__post_count",
+    "stats__follower_count",
+    "stats__following_count",
+)
+NAMES = ("username", "first_name", "last_name")
+
+
+def _first(queryset):
+    # Без ``first()``: он сортирует по pk, и к агрегату на одну строку
+    # добавляется сортировка во временном B-дереве.
+    return next(iter(queryset.order_by()[:1]), None)
+
+
+def _following(request, author_ref):
+    if not request.user.is_authenticated:
+        return {}
+    return {
+        "is_following": Exists(
+            Follow.objects.filter(user=request.user, author=author_ref)
+        )
+    }
+
+
+def post_state(request, post_id):
+    return _first(
+        Post.objects.filter(id=post_id)
+        .annotate(last_comment=Max("comments__updated"))
+        .values(
+            "updated",
+            "comment_count",
+            "last_comment",
+            *(f"author__{field}" for field in NAMES + STATS),
+        )
+    )
+
+
+def profile_state(request, username):
+    return _first(
+        User.objects.filter(username=username)
+        .annotate(
+            last_post=Max("posts__updated"),
+            **_following(request, OuterRef("pk")),
+        )
+        .values("last_post", *NAMES, *STATS)
+    )
+
+
+def group_state(request, slug):
+    # Лента выводит имена авторов: их правка - последнее изменение
+    # профиля среди авторов постов группы.
+    return _first(
+        Group.objects.filter(slug=slug)
+        .annotate(
+            last_post=Max("posts__updated"),
+            post_count=Count("posts"),
+            last_author=Max("posts__author__stats__profile_updated"),
+        )
+        .values(
+            "title", "description", "last_post", "post_count", "last_author"
+        )
+    )
+
+
+def _last_modified(state):
+    moments = [
+        value
+        for key, value in state.items()
+        if key in ("updated", "last_comment", "last_post", "last_author")
+        and value
+    ]
+    return timegm(max(moments).utctimetuple()) if moments else None
+
+
+def conditional_page(state_func):
+    """Ответить 304, если состояние страницы не изменилось.
+
+    ``state_func(request, *args, **kwargs)`` возвращает словарь значений,
+    от которых зависит страница, или None - тогда её отрисует (или
+    ответит 404) само представление.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            state = state_func(request, *args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            digest = hashlib.md5(
+                repr((sorted(state.items()), request.user.pk)).encode()
+            ).hexdigest()
+            etag = quote_etag(digest)
+            last_modified = (
+                None
+                if request.user.is_authenticated
+                else _last_modified(state)
+            )
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response["ETag"] = etag
+                if last_modified is not None:
+                    response["Last-Modified"] = http_date(last_modified)
+            return response
+
+        return wrapper
+
+    return decorator
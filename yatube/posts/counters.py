@@ -0,0 +1,73 @@
+"""Денормализованные счётчики постов, подписок и комментариев.
+
+Счётчики меняются атомарным ``UPDATE ... SET n = n + 1`` из сигналов
+(см. ``signals.py``), в одной транзакции с самой записью.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def _count(queryset, field):
+    """Подзапрос «сколько строк ``queryset`` ссылается на ``OuterRef``»."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(n=Count("pk"))
+            .values("n")
+        ),
+        0,
+    )
+
+
+def bump_user(user_id, create=True, **deltas):
+    """Изменить счётчики пользователя на ``deltas``.
+
+    Если строки статистики ещё нет, она пересчитывается с нуля - но
+    только при ``create``: при каскадном удалении пользователя создавать
+    её нельзя.
+    """
+    bump_users([user_id], create, **deltas)
+
+
+def bump_users(user_ids, create=True, **deltas):
+    """То же, что ``bump_user``, для нескольких пользователей сразу."""
+    updated = UserStats.objects.filter(user_id__in=user_ids).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if updated < len(user_ids) and create:
+        # Пересчёт с нуля верен и для уже обновлённых строк.
+        rebuild_users(User.objects.filter(pk__in=user_ids))
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F("comment_count") + delta
+    )
+
+
+def rebuild_users(users=None):
+    """Пересчитать статистику пользователей (по умолчанию - всех)."""
+    users = User.objects.all() if users is None else users
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in users.values_list("pk", flat=True)],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    # Первичный ключ UserStats - это id пользователя, поэтому
+    # подзапросы ссылаются на него через OuterRef("pk").
+    return UserStats.objects.filter(user__in=users).update(
+        post_count=_count(Post.objects.all(), "author"),
+        follower_count=_count(Follow.objects.all(), "author"),
+        following_count=_count(Follow.objects.all(), "user"),
+    )
+
+
+def rebuild_comments():
+    """Пересчитать ``Post.comment_count`` одним UPDATE."""
+    return Post.objects.update(
+        comment_count=_count(Comment.objects.all(), "post")
+    )
@@ -0,0 +1,123 @@
+"""Подписки и отписки одним запросом.
+
+Подписка - ``INSERT``, пропускающий уже существующие пары (ограничение
+``unique_pair``), отписка - ``DELETE``; оба возвращают через
+``RETURNING`` авторов, которых запрос действительно затронул (нужен
+SQLite 3.35+ или PostgreSQL; со старым SQLite проект не запустится -
+проверка ``posts.E001`` в posts/checks.py). Поэтому повторная подписка,
+как и гонка двух одинаковых запросов, ничего не делает и не падает, а
+счётчики, ленты и кеш страниц обновляются только для затронутых авторов.
+
+Авторы задаются запросом пользователей (``User.objects.filter(...)``):
+он становится подзапросом того же ``INSERT``/``DELETE``, и поиск
+автора по имени отдельного запроса не требует.
+"""
+from django.db import connection, transaction
+
+from . import counters, page_cache, timeline
+from .models import Follow, User
+
+# Столько имён за раз - в пределах числа параметров запроса SQLite.
+BATCH_SIZE = 500
+
+
+def _authors_sql(authors, user_id):
+    """SQL и параметры подзапроса id авторов - без самого подписчика."""
+    query = authors.exclude(pk=user_id).order_by().values("pk").query
+    return query.sql_with_params()
+
+
+def _returning(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def follow(user_id, authors):
+    """Подписать пользователя на ``authors``; id новых подписок."""
+    ops = connection.ops
+    table = ops.quote_name(Follow._meta.db_table)
+    subquery, params = _authors_sql(authors, user_id)
+    with transaction.atomic(savepoint=False):
+        author_ids = _returning(
+            f"{ops.insert_statement(ignore_conflicts=True)} {table} "
+            f"(user_id, author_id) SELECT %s, id FROM ({subquery}) "
+            f"{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)} "
+            "RETURNING author_id",
+            [user_id, *params],
+        )
+        if author_ids:
+            followed(user_id, author_ids)
+    return author_ids
+
+
+def unfollow(user_id, authors):
+    """Отписать пользователя от ``authors``; id снятых подписок."""
+    table = connection.ops.quote_name(Follow._meta.db_table)
+    subquery, params = _authors_sql(authors, user_id)
+    with transaction.atomic(savepoint=False):
+        author_ids = _returning(
+            f"DELETE FROM {table} WHERE user_id = %s "
+            f"AND author_id IN ({subquery}) RETURNING author_id",
+            [user_id, *params],
+        )
+        if author_ids:
+            unfollowed(user_id, author_ids)
+    return author_ids
+
+
+def followed(user_id, author_ids):
+    """Счётчики, ленты и кеш после новых подписок."""
+    author_ids = sorted(author_ids)
+    counters.bump_users(author_ids, follower_count=1)
+    counters.bump_user(user_id, following_count=len(author_ids))
+    timeline.backfill(user_id, author_ids)
+    _bump_pages(user_id, author_ids)
+
+
+def unfollowed(user_id, author_ids):
+    """Счётчики, ленты и кеш после отписок."""
+    author_ids = sorted(author_ids)
+    counters.bump_users(author_ids, create=False, follower_count=-1)
+    counters.bump_user(
+        user_id, create=False, following_count=-len(author_ids)
+    )
+    timeline.refill(author_ids)
+    timeline.prune(user_id, author_ids)
+    _bump_pages(user_id, author_ids)
+
+
+def _bump_pages(user_id, author_ids):
+    page_cache.bump(
+        f"author:{user_id}", *(f"author:{pk}" for pk in author_ids)
+    )
+
+
+def apply(user_id, follow_authors=None, unfollow_authors=None):
+    """Подписки и отписки пачками в одной транзакции.
+
+    ``follow_authors``/``unfollow_authors`` - запросы пользователей или
+    списки имён. Возвращает множества затронутых id авторов.
+    """
+    done = {"followed": set(), "unfollowed": set()}
+    with transaction.atomic(savepoint=False):
+        for key, action, authors in (
+            ("followed", follow, follow_authors),
+            ("unfollowed", unfollow, unfollow_authors),
+        ):
+            for batch in _author_batches(authors):
+                done[key] |= action(user_id, batch)
+    return done
+
+
+def _author_batches(authors):
+    if authors is None:
+        return
+    if not isinstance(authors, (list, tuple, set)):
+        yield authors
+        return
+    names = sorted(set(authors))
+    for start in range(0, len(names), BATCH_SIZE):
+        yield User.objects.filter(
+            username__in=names[start:start + BATCH_SIZE]
+        )
@@ -0,0 +1,57 @@
+"""Фрагменты лент для бесконечной прокрутки.
+
+Страница ленты помечает посты и навигацию блоком ``{% block feed %}``.
+С параметром ``?fragment=1`` представление рендерит только этот блок -
+без ``base.html``, меню, подвала и боковой колонки автора, - а
+навигация в нём служит маркером следующей порции: в ней курсор
+``?after=``. Скрипт ``includes/paginator.html`` подменяет навигацию
+следующей порцией, когда она показывается на экране.
+
+Признак фрагмента - параметр, а не заголовок: страница и фрагмент
+лежат в кеше страниц и в кеше браузера под разными адресами без
+``Vary``.
+"""
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.template import RequestContext
+from django.template.loader import get_template
+from django.template.loader_tags import BlockNode
+
+from . import timing
+
+PARAM = "fragment"
+BLOCK = "feed"
+
+
+def wants_fragment(request):
+    return request.GET.get(PARAM) == "1"
+
+
+def _block(template, name):
+    for node in template.nodelist.get_nodes_by_type(BlockNode):
+        if node.name == name:
+            return node
+    raise LookupError(f"{template.origin.template_name}: нет блока {name}")
+
+
+def render_block(request, template_name, block_name, context):
+    """Отрендерить один блок шаблона так же, как его рендерит страница:
+    с контекст-процессорами и ``{% include %}`` того же движка."""
+    template = get_template(template_name).template
+    node = _block(template, block_name)
+    context = RequestContext(request, context)
+    with timing.measure("tpl"), context.render_context.push_state(template):
+        with context.bind_template(template):
+            context.template_name = template.name
+            return node.render(context)
+
+
+def render_feed(request, template_name, context):
+    """Страница ленты или, при ``?fragment=1``, только её блок ``feed``."""
+    context = {**context, "feed_fragments": True}
+    if wants_fragment(request):
+        context["fragment"] = True
+        return HttpResponse(
+            render_block(request, template_name, BLOCK, context)
+        )
+    return render(request, template_name, context)
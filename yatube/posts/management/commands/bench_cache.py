@@ -0,0 +1,131 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from yatube.cache import TwoTierCache
+
+PARAMS = {"OPTIONS": {"MAX_ENTRIES": 10 ** 6}}
+BACKENDS = {
+    # Имя с pid: иначе форкнутые воркеры унаследуют данные родителя.
+    "locmem": lambda path: LocMemCache(f"bench-{os.getpid()}", PARAMS),
+    "filebased": lambda path: FileBasedCache(
+        os.path.join(path, "files"), PARAMS
+    ),
+    "twotier": lambda path: TwoTierCache(
+        os.path.join(path, "cache.sqlite3"), PARAMS
+    ),
+}
+
+
+def _rate(count, seconds):
+    return count / seconds if seconds else float("inf")
+
+
+def _single(make, path, keys, reads):
+    """Запись, чтение горячих ключей и get_many в одном процессе."""
+    cache = make(path)
+    value = {"html": "x" * 2048}
+    started = time.perf_counter()
+    for key in keys:
+        cache.set(key, value)
+    set_time = time.perf_counter() - started
+    started = time.perf_counter()
+    for i in range(reads):
+        cache.get(keys[i % len(keys)])
+    get_time = time.perf_counter() - started
+    batches = [keys[i:i + 10] for i in range(0, len(keys), 10)]
+    started = time.perf_counter()
+    for batch in batches:
+        cache.get_many(batch)
+    many_time = time.perf_counter() - started
+    return {
+        "set/s": _rate(len(keys), set_time),
+        "get/s": _rate(reads, get_time),
+        "get_many(10)/s": _rate(len(batches), many_time),
+    }
+
+
+def _worker(name, path, index, keys, reads, barrier, results):
+    cache = BACKENDS[name](path)
+    barrier.wait()
+    if index == 0:
+        cache.set_many({key: {"html": "x" * 2048} for key in keys})
+    barrier.wait()
+    hits = 0
+    started = time.perf_counter()
+    for i in range(reads):
+        hits += cache.get(keys[i % len(keys)]) is not None
+    results.put((hits, reads, time.perf_counter() - started))
+
+
+def _workers(name, path, keys, reads, workers):
+    """Один воркер пишет ключи, все читают: общий ли кеш у воркеров."""
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=_worker,
+            args=(name, path, index, keys, reads, barrier, results),
+        )
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    hits = sum(row[0] for row in collected)
+    total = sum(row[1] for row in collected)
+    slowest = max(row[2] for row in collected)
+    return {
+        "hit ratio": hits / total,
+        f"get/s x{workers}": _rate(total, slowest),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает LocMemCache, FileBasedCache и TwoTierCache: "
+        "скорость в одном процессе и долю попаданий у нескольких воркеров"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keys", type=int, default=1000)
+        parser.add_argument("--reads", type=int, default=20000)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--backend",
+            action="append",
+            choices=sorted(BACKENDS),
+            help="Какие бэкенды мерить (по умолчанию - все)",
+        )
+
+    def handle(self, *args, **options):
+        keys = [f"bench:{i}" for i in range(options["keys"])]
+        for name in options["backend"] or list(BACKENDS):
+            path = tempfile.mkdtemp(prefix="bench_cache_")
+            try:
+                row = _single(BACKENDS[name], path, keys, options["reads"])
+                row.update(
+                    _workers(
+                        name, path, keys, options["reads"], options["workers"]
+                    )
+                )
+            finally:
+                shutil.rmtree(path, ignore_errors=True)
+            self.stdout.write(
+                f"{name:<10}"
+                + "  ".join(
+                    f"{label}: {value:.0%}"
+                    if label == "hit ratio"
+                    else f"{label}: {value:,.0f}"
+                    for label, value in row.items()
+                )
+            )
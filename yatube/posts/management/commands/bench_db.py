@@ -0,0 +1,186 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from posts import views
+from posts.models import Post, User
+from posts.retry import is_locked
+
+
+def _seed(users, posts):
+    authors = [
+        User.objects.create_user(username=f"bench{i}") for i in range(users)
+    ]
+    for i in range(posts):
+        Post.objects.create(text=f"Пост {i}", author=authors[i % users])
+
+
+def _operation(factory, users, post_ids, write_ratio):
+    """Один «запрос»: чтение страницы поста, комментарий или
+    подписка/отписка. Возвращает (пишущий ли, ответ)."""
+    user = random.choice(users)
+    post_id = random.choice(post_ids)
+    if random.random() >= write_ratio:
+        request = factory.get(reverse("post", args=[post_id]))
+        request.user = AnonymousUser()
+        return False, views.post_view(request, post_id)
+    if random.random() < 0.5:
+        request = factory.post(
+            reverse("add_comment", args=[post_id]), {"text": "Комментарий"}
+        )
+        request.user = user
+        return True, views.add_comment(request, post_id)
+    author = random.choice(users).username
+    view = random.choice([views.profile_follow, views.profile_unfollow])
+    request = factory.get("/")
+    request.user = user
+    return True, view(request, author)
+
+
+def _worker(seconds, write_ratio, barrier, results):
+    factory = RequestFactory()
+    users = list(User.objects.all())
+    post_ids = list(Post.objects.values_list("id", flat=True))
+    close_old_connections()
+    counts = {"read": 0, "write": 0, "locked": 0}
+    latencies = []
+    barrier.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            writing, _ = _operation(factory, users, post_ids, write_ratio)
+            counts["write" if writing else "read"] += 1
+        except Exception as error:
+            if not is_locked(error):
+                raise
+            counts["locked"] += 1
+        finally:
+            # Конец запроса: как request_finished в обработчике Django.
+            close_old_connections()
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+    results.put((counts, latencies))
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагружает представления чтением и записью из нескольких "
+        "процессов и сравнивает голый sqlite3 с настройками из "
+        "settings.DATABASES: PRAGMA, CONN_MAX_AGE и повторы записи"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument(
+            "--write-ratio",
+            type=float,
+            default=0.2,
+            help="Доля пишущих запросов",
+        )
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--posts", type=int, default=500)
+
+    def use_database(self, name, pragmas, max_age):
+        connection.close()
+        connection.settings_dict.update(NAME=name, CONN_MAX_AGE=max_age)
+        options = connection.settings_dict["OPTIONS"]
+        if pragmas is None:
+            options.pop("pragmas", None)
+        else:
+            options["pragmas"] = pragmas
+        cache.clear()
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        original = dict(settings_dict, OPTIONS=dict(settings_dict["OPTIONS"]))
+        # Прежняя конфигурация (голый sqlite3, новое соединение на каждый
+        # запрос, без повторов) и текущая из settings.DATABASES.
+        scenarios = {
+            "bare": (None, 0, 1),
+            "tuned": (
+                original["OPTIONS"].get("pragmas"),
+                original["CONN_MAX_AGE"],
+                settings.DB_RETRY_ATTEMPTS,
+            ),
+        }
+        path = tempfile.mkdtemp(prefix="bench_db_")
+        seed = os.path.join(path, "seed.sqlite3")
+        try:
+            self.use_database(seed, None, 0)
+            call_command("migrate", verbosity=0)
+            _seed(options["users"], options["posts"])
+            for name, (pragmas, max_age, attempts) in scenarios.items():
+                database = os.path.join(path, f"{name}.sqlite3")
+                connection.close()
+                shutil.copy(seed, database)
+                self.use_database(database, pragmas, max_age)
+                with override_settings(DB_RETRY_ATTEMPTS=attempts):
+                    self.report(name, self.run(options))
+        finally:
+            connection.close()
+            settings_dict.clear()
+            settings_dict.update(original)
+            shutil.rmtree(path, ignore_errors=True)
+
+    def run(self, options):
+        context = multiprocessing.get_context("fork")
+        barrier = context.Barrier(options["workers"])
+        results = context.Queue()
+        # Открытое соединение не должно достаться форкам.
+        connection.close()
+        processes = [
+            context.Process(
+                target=_worker,
+                args=(
+                    options["seconds"],
+                    options["write_ratio"],
+                    barrier,
+                    results,
+                ),
+            )
+            for _ in range(options["workers"])
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        counts = {"read": 0, "write": 0, "locked": 0}
+        latencies = []
+        for worker_counts, worker_latencies in collected:
+            for key, value in worker_counts.items():
+                counts[key] += value
+            latencies.extend(worker_latencies)
+        latencies.sort()
+        return {
+            "reads/s": counts["read"] / options["seconds"],
+            "writes/s": counts["write"] / options["seconds"],
+            "locked": counts["locked"],
+            "p50 ms": latencies[len(latencies) // 2] * 1000,
+            "p99 ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        }
+
+    def report(self, name, row):
+        self.stdout.write(
+            f"{name:<6}"
+            + "  ".join(
+                f"{label}: {value:,.0f}"
+                if label in ("locked",)
+                else f"{label}: {value:,.1f}"
+                for label, value in row.items()
+            )
+        )
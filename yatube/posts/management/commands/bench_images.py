@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+
+from posts import thumbnails
+from posts.models import Post
+from posts.pagination import POSTS_PER_PAGE
+
+# Ширина окна, плотность пикселей и форматы, которые понимает браузер.
+CLIENTS = (
+    ("телефон 360px @2x, AVIF+WebP", 360, 2, ("AVIF", "WEBP")),
+    ("телефон 360px @2x, только JPEG", 360, 2, ()),
+    ("планшет 768px @2x, WebP", 768, 2, ("WEBP",)),
+    ("ноутбук 1280px @1x, WebP", 1280, 1, ("WEBP",)),
+    ("монитор 1920px @2x, AVIF+WebP", 1920, 2, ("AVIF", "WEBP")),
+)
+
+
+def slot_width(viewport):
+    """Ширина картинки в CSS-пикселях по ``sizes`` из post_card.html."""
+    return viewport * 0.75 if viewport >= 768 else viewport
+
+
+def choose(picture, viewport, density, accepts):
+    """Вариант, который браузер выберет из ``<picture>`` карточки."""
+    fmt = next(
+        (fmt for fmt in thumbnails.MODERN_FORMATS if fmt in accepts), None
+    )
+    needed = slot_width(viewport) * density
+    widths = [
+        width
+        for width in thumbnails.CARD_WIDTHS
+        if picture.variants[(width, fmt)] is not None
+    ]
+    if not widths:
+        fmt, widths = None, list(thumbnails.CARD_WIDTHS)
+    width = next((w for w in widths if w >= needed), widths[-1])
+    return picture.variants[(width, fmt)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Считает байты картинок на странице ленты: одна миниатюра 960x339 "
+        "для всех против <picture> с шириной и форматом под клиента. "
+        "Недостающие варианты создаёт"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--posts",
+            type=int,
+            default=POSTS_PER_PAGE,
+            help="Сколько последних постов с картинками взять",
+        )
+
+    def handle(self, *args, **options):
+        posts = list(
+            Post.objects.exclude(image="")
+            .exclude(image__isnull=True)
+            .order_by("-pub_date")[: options["posts"]]
+        )
+        pictures = []
+        for post in posts:
+            picture = thumbnails.card_picture(post.image)
+            if picture is None or not picture.complete:
+                thumbnails.create(post.image)
+                picture = thumbnails.card_picture(post.image)
+            if picture is not None:
+                pictures.append((post, picture))
+        if not pictures:
+            self.stdout.write("Нет постов с читаемыми картинками")
+            return
+
+        def size(image):
+            return default.storage.size(image.name)
+
+        originals = sum(post.image.size for post, _ in pictures)
+        before = sum(size(picture.fallback) for _, picture in pictures)
+        formats = ", ".join(thumbnails.MODERN_FORMATS) or "нет"
+        self.stdout.write(
+            f"Картинок: {len(pictures)}; современные форматы в этой "
+            f"сборке Pillow: {formats}"
+        )
+        self.stdout.write(f"{'оригиналы':<34}{originals:>12,} Б")
+        self.stdout.write(f"{'до: JPEG 960x339 всем':<34}{before:>12,} Б")
+        for label, viewport, density, accepts in CLIENTS:
+            after = sum(
+                size(choose(picture, viewport, density, accepts))
+                for _, picture in pictures
+            )
+            self.stdout.write(
+                f"{label:<34}{after:>12,} Б  {after / before:>6.0%}"
+            )
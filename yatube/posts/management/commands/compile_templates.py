@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import precompile
+
+
+class Command(BaseCommand):
+    help = (
+        "Компилирует все шаблоны проекта и приложений: ошибки синтаксиса "
+        "видны до выкладки"
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            count = precompile.compile_all()
+        except precompile.TemplateErrors as error:
+            raise CommandError(error)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Скомпилировано шаблонов: {count} "
+                f"за {time.perf_counter() - started:.2f} с"
+            )
+        )
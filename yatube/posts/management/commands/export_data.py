@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоково выгружает пользователей, группы, посты, комментарии и "
+        "подписки в NDJSON или JSON-массив (формат dumpdata)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-o", "--output", help="Файл для выгрузки (по умолчанию stdout)"
+        )
+        parser.add_argument(
+            "--format", choices=("ndjson", "json"), default="ndjson"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=bulk.BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        counts = {}
+
+        def progress(label, rows):
+            counts[label] = counts.get(label, 0) + rows
+
+        objects = bulk.export_objects(
+            batch_size=options["batch_size"], progress=progress
+        )
+        ndjson = options["format"] == "ndjson"
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                bulk.write_objects(stream, objects, ndjson=ndjson)
+        else:
+            self.stdout.ending = ""
+            bulk.write_objects(self.stdout, objects, ndjson=ndjson)
+        # Отчёт - в stderr, чтобы не смешиваться с данными в stdout.
+        for label, rows in counts.items():
+            self.stderr.write(f"{label}: {rows:,}")
@@ -0,0 +1,88 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import follows
+from posts.models import User
+
+
+def read_names(path):
+    """Имена из файла, по одному в строке; пустые строки и # - пропуск."""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        return [
+            line.strip()
+            for line in stream
+            if line.strip() and not line.startswith("#")
+        ]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Подписывает пользователя на авторов (или отписывает от них) "
+        "пачками в одной транзакции: для онбординга и переноса аккаунтов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="Кого подписывать")
+        parser.add_argument("authors", nargs="*", help="Имена авторов")
+        parser.add_argument(
+            "--file", help="Файл с именами авторов по одному в строке, - stdin"
+        )
+        parser.add_argument(
+            "--copy-from",
+            metavar="USERNAME",
+            help="Взять авторов из подписок другого пользователя",
+        )
+        parser.add_argument(
+            "--unfollow", action="store_true", help="Отписать, а не подписать"
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["username"]).first()
+        if user is None:
+            raise CommandError(f"Нет пользователя {options['username']}")
+        names = list(options["authors"])
+        if options["file"]:
+            try:
+                names += read_names(options["file"])
+            except OSError as error:
+                raise CommandError(error)
+        authors = names
+        if options["copy_from"]:
+            if names:
+                raise CommandError("--copy-from не сочетается с именами")
+            source = User.objects.filter(username=options["copy_from"])
+            if not source.exists():
+                raise CommandError(f"Нет пользователя {options['copy_from']}")
+            authors = User.objects.filter(following__user__in=source)
+        elif not names:
+            raise CommandError("Не заданы авторы")
+
+        if options["unfollow"]:
+            done = follows.apply(user.id, unfollow_authors=authors)
+        else:
+            done = follows.apply(user.id, follow_authors=authors)
+        unknown = sorted(set(names) - self.existing(names))
+        if unknown:
+            self.stderr.write("Нет пользователей: " + ", ".join(unknown))
+        key = "unfollowed" if options["unfollow"] else "followed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{'Отписан от' if options['unfollow'] else 'Подписан на'} "
+                f"{len(done[key])} авторов"
+            )
+        )
+
+    def existing(self, names):
+        found = set()
+        for start in range(0, len(names), follows.BATCH_SIZE):
+            found.update(
+                User.objects.filter(
+                    username__in=names[start:start + follows.BATCH_SIZE]
+                ).values_list("username", flat=True)
+            )
+        return found
@@ -0,0 +1,109 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import datagen
+from posts.management.commands.warm_thumbnails import since_type
+
+# Объёмы при --scale 1; явные --users/--posts/... их заменяют.
+BASE = {"users": 1000, "groups": 20, "posts": 10000, "comments": 30000}
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет пустую базу синтетическими пользователями, группами, "
+        "постами, комментариями и подписками (степенной закон) в заданном "
+        "масштабе. Одинаковые --seed и --until дают одинаковые данные"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            type=float,
+            default=1,
+            help=(
+                "Множитель объёмов: 1 - тысяча пользователей и 10 тысяч "
+                "постов, 100 - миллион постов"
+            ),
+        )
+        for name in BASE:
+            parser.add_argument(f"--{name}", type=int)
+        parser.add_argument(
+            "--follows",
+            type=int,
+            default=20,
+            help="Среднее число подписок пользователя",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--until",
+            type=since_type,
+            help="Дата самого нового поста (по умолчанию - начало суток)",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="За сколько дней распределить посты",
+        )
+        parser.add_argument(
+            "--images",
+            type=float,
+            default=0,
+            help="Доля постов с картинкой из MEDIA_ROOT/posts",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=datagen.BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        if not datagen.is_empty():
+            raise CommandError(
+                "В базе уже есть данные; сгенерированные ключи с ними "
+                "пересекутся. Очистите её: manage.py flush"
+            )
+        counts = {
+            name: (
+                options[name]
+                if options[name] is not None
+                else max(1, round(base * options["scale"]))
+            )
+            for name, base in BASE.items()
+        }
+        until = options["until"] or datagen.default_until()
+        started = time.perf_counter()
+        done = {"rows": 0, "reported": started}
+
+        def progress(label, rows):
+            done["rows"] += rows
+            now = time.perf_counter()
+            if now - done["reported"] >= 1:
+                done["reported"] = now
+                self.stdout.write(
+                    f"{label}: всего {done['rows']:,} строк, "
+                    f"{done['rows'] / (now - started):,.0f} строк/с"
+                )
+
+        generator = datagen.Generator(
+            until,
+            seed=options["seed"],
+            follows=options["follows"],
+            days=options["days"],
+            images=options["images"],
+            batch_size=options["batch_size"],
+            progress=progress,
+            **counts,
+        )
+        if options["images"] and not generator.image_names():
+            raise CommandError("В MEDIA_ROOT/posts нет картинок")
+        created = generator.generate()
+        elapsed = time.perf_counter() - started
+        for label, rows in created.items():
+            self.stdout.write(f"{label}: {rows:,}")
+        total = sum(created.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано {total:,} строк за {elapsed:.1f} с (со "
+                "счётчиками, лентами и поисковым индексом)"
+            )
+        )
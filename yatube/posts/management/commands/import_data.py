@@ -0,0 +1,84 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоково загружает JSON (формат dumpdata) или NDJSON: пачками "
+        "bulk_create в порядке пользователи, группы, посты, комментарии, "
+        "подписки"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл с данными, - для stdin")
+        parser.add_argument(
+            "--batch-size", type=int, default=bulk.BATCH_SIZE
+        )
+        parser.add_argument(
+            "--signals",
+            action="store_true",
+            help="Отправлять pre_save/post_save с raw=True, как loaddata",
+        )
+        parser.add_argument(
+            "--ignore-conflicts",
+            action="store_true",
+            help="Пропускать строки с уже существующими ключами",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        done = {"rows": 0, "reported": started}
+
+        def progress(label, rows):
+            done["rows"] += rows
+            now = time.perf_counter()
+            if now - done["reported"] >= 1:
+                done["reported"] = now
+                self.stdout.write(
+                    f"{label}: всего {done['rows']:,} строк, "
+                    f"{done['rows'] / (now - started):,.0f} строк/с"
+                )
+
+        loader = bulk.Loader(
+            batch_size=options["batch_size"],
+            send_signals=options["signals"],
+            ignore_conflicts=options["ignore_conflicts"],
+            progress=progress,
+        )
+        path = options["path"]
+        try:
+            if path == "-":
+                loaded = loader.load(sys.stdin)
+            else:
+                with open(path, encoding="utf-8") as stream:
+                    loaded = loader.load(stream)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        except IntegrityError as error:
+            raise CommandError(
+                f"{error}. Уже загруженные пачки остались в базе; "
+                "повторите с --ignore-conflicts, чтобы пропустить их"
+            )
+        elapsed = time.perf_counter() - started
+        for label, rows in loaded.items():
+            self.stdout.write(f"{label}: {rows:,}")
+        if loader.skipped:
+            self.stdout.write(
+                "Пропущены модели: "
+                + ", ".join(
+                    f"{label} ({rows})"
+                    for label, rows in sorted(loader.skipped.items())
+                )
+            )
+        total = sum(loaded.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Обработано {total:,} строк за {elapsed:.1f} с, "
+                f"{total / elapsed:,.0f} строк/с"
+            )
+        )
@@ -0,0 +1,318 @@
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from threading import BrokenBarrierError
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts import datagen
+from posts.budget import count_queries
+from posts.models import Group, Post, User
+
+PERCENTILES = (50, 95, 99)
+
+
+class Session:
+    """Клиент нагрузки: вошедший пользователь и случайные адреса."""
+
+    def __init__(self, rng, user):
+        self.rng = rng
+        self.user = user
+        self.client = Client()
+        self.client.force_login(user)
+        self.post_ids = list(Post.objects.values_list("id", flat=True))
+        self.own_posts = list(
+            Post.objects.filter(author=user).values_list("id", flat=True)
+        )
+        self.usernames = list(User.objects.values_list("username", flat=True))
+        self.slugs = list(Group.objects.values_list("slug", flat=True))
+
+    def request(self, route):
+        """(метод, адрес, данные) одного запроса к маршруту."""
+        rng = self.rng
+        if route == "index":
+            return "get", reverse("index"), None
+        if route == "group":
+            slug = rng.choice(self.slugs)
+            return "get", reverse("group", args=[slug]), None
+        if route == "profile":
+            username = rng.choice(self.usernames)
+            return "get", reverse("profile", args=[username]), None
+        if route == "post":
+            post_id = rng.choice(self.post_ids)
+            return "get", reverse("post", args=[post_id]), None
+        if route == "post_comments":
+            post_id = rng.choice(self.post_ids)
+            return "get", reverse("post_comments", args=[post_id]), None
+        if route == "follow_index":
+            return "get", reverse("follow_index"), None
+        if route == "search":
+            return "get", reverse("search"), {"q": rng.choice(datagen.WORDS)}
+        if route == "create":
+            return "post", reverse("create"), {"text": "Новый пост"}
+        if route == "post_edit":
+            post_id = rng.choice(self.own_posts or self.post_ids)
+            url = reverse("post_edit", args=[post_id])
+            return "post", url, {"text": "Правка"}
+        if route == "add_comment":
+            url = reverse("add_comment", args=[rng.choice(self.post_ids)])
+            return "post", url, {"text": "Комментарий"}
+        username = rng.choice(self.usernames)
+        return "get", reverse(route, args=[username]), None
+
+
+ROUTES = (
+    "index",
+    "group",
+    "profile",
+    "post",
+    "post_comments",
+    "follow_index",
+    "search",
+    "create",
+    "post_edit",
+    "add_comment",
+    "profile_follow",
+    "profile_unfollow",
+)
+
+
+def _client(index, seed_value, routes, rounds, barrier, results):
+    """Процесс-клиент: ``rounds`` раз обходит маршруты в случайном
+    порядке. Возвращает по маршрутам (секунды, запросы, статус)."""
+    try:
+        rng = random.Random(seed_value * 1000 + index)
+        users = list(User.objects.order_by("id"))
+        session = Session(rng, users[index % len(users)])
+    except Exception as error:
+        barrier.abort()
+        results.put(error)
+        raise
+    samples = {route: [] for route in routes}
+    try:
+        barrier.wait()
+    except BrokenBarrierError as error:
+        # Другой клиент не запустился; без ответа run() ждал бы вечно.
+        results.put(error)
+        return
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for route in rng.sample(routes, len(routes)):
+            method, url, data = session.request(route)
+            with count_queries() as queries:
+                begin = time.perf_counter()
+                try:
+                    status = getattr(session.client, method)(
+                        url, data
+                    ).status_code
+                except Exception:
+                    # Тестовый клиент пробрасывает исключение
+                    # представления; для нагрузки это ответ 500.
+                    status = 500
+                elapsed = time.perf_counter() - begin
+            samples[route].append((elapsed, len(queries), status))
+    connection.close()
+    results.put((time.perf_counter() - started, samples))
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу; ``values`` отсортированы."""
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[rank - 1]
+
+
+def summarize(samples, wall):
+    latencies = sorted(sample[0] for sample in samples)
+    row = {
+        "requests": len(samples),
+        "rps": round(len(samples) / wall, 1),
+        "errors": sum(sample[2] >= 400 for sample in samples),
+        "queries": round(sum(s[1] for s in samples) / len(samples), 2),
+    }
+    for percent in PERCENTILES:
+        row[f"p{percent}_ms"] = round(
+            percentile(latencies, percent) * 1000, 2
+        )
+    return row
+
+
+def compare(report, baseline, tolerance):
+    """Регрессии относительно базового отчёта: выросли p95 или число
+    запросов больше чем на ``tolerance``, или появились ошибки."""
+    problems = []
+    for route, row in report["routes"].items():
+        base = baseline.get("routes", {}).get(route)
+        if base is None:
+            continue
+        for key in ("p95_ms", "queries"):
+            if row[key] > base[key] * (1 + tolerance):
+                problems.append(
+                    f"{route}: {key} {base[key]} -> {row[key]}"
+                )
+        if row["errors"] > base["errors"]:
+            problems.append(
+                f"{route}: errors {base['errors']} -> {row['errors']}"
+            )
+    return problems
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест маршрутов posts.urls: заполняет временную базу, "
+        "гоняет параллельных клиентов и печатает JSON с p50/p95/p99, "
+        "запросами в секунду и SQL-запросами на запрос. С --baseline "
+        "сравнивает результат с сохранённым отчётом"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=4)
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=20,
+            help="Сколько раз каждый клиент обходит все маршруты",
+        )
+        parser.add_argument(
+            "--route",
+            action="append",
+            choices=ROUTES,
+            help="Какие маршруты нагружать (по умолчанию - все)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--groups", type=int, default=10)
+        parser.add_argument("--posts", type=int, default=2000)
+        parser.add_argument("--comments", type=int, default=5000)
+        parser.add_argument(
+            "--follows",
+            type=int,
+            default=10,
+            help="Среднее число подписок пользователя",
+        )
+        parser.add_argument(
+            "-o", "--output", help="Файл для JSON-отчёта (по умолчанию stdout)"
+        )
+        parser.add_argument(
+            "--baseline", help="Отчёт прошлого запуска для сравнения"
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Допустимый рост p95 и числа запросов (доля)",
+        )
+
+    def handle(self, *args, **options):
+        routes = tuple(options["route"] or ROUTES)
+        settings_dict = connection.settings_dict
+        original_name = settings_dict["NAME"]
+        path = tempfile.mkdtemp(prefix="loadtest_")
+        try:
+            connection.close()
+            settings_dict["NAME"] = os.path.join(path, "db.sqlite3")
+            call_command("migrate", verbosity=0)
+            datagen.Generator(
+                datagen.default_until(),
+                seed=options["seed"],
+                users=options["users"],
+                groups=options["groups"],
+                posts=options["posts"],
+                comments=options["comments"],
+                follows=options["follows"],
+            ).generate()
+            # Бюджеты запросов при DEBUG роняют запрос, а повтор записи
+            # после блокировки их превышает; здесь число запросов
+            # попадает в отчёт.
+            with override_settings(QUERY_BUDGET_CHECK=False):
+                wall, samples = self.run(routes, options)
+        finally:
+            connection.close()
+            settings_dict["NAME"] = original_name
+            shutil.rmtree(path, ignore_errors=True)
+
+        report = {
+            "config": {
+                key: options[key]
+                for key in (
+                    "clients",
+                    "rounds",
+                    "seed",
+                    "users",
+                    "groups",
+                    "posts",
+                    "comments",
+                    "follows",
+                )
+            },
+            "total": summarize(
+                [s for route in routes for s in samples[route]], wall
+            ),
+            "routes": {
+                route: summarize(samples[route], wall) for route in routes
+            },
+        }
+        text = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(text + "\n")
+        else:
+            self.stdout.write(text)
+
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as file:
+                baseline = json.load(file)
+            problems = compare(report, baseline, options["tolerance"])
+            if problems:
+                raise CommandError(
+                    "Регрессия относительно базового отчёта:\n"
+                    + "\n".join(problems)
+                )
+            self.stderr.write("Регрессий относительно базового отчёта нет")
+
+    def run(self, routes, options):
+        context = multiprocessing.get_context("fork")
+        barrier = context.Barrier(options["clients"])
+        results = context.Queue()
+        # Открытое соединение не должно достаться форкам.
+        connection.close()
+        processes = [
+            context.Process(
+                target=_client,
+                args=(
+                    index,
+                    options["seed"],
+                    routes,
+                    options["rounds"],
+                    barrier,
+                    results,
+                ),
+            )
+            for index in range(options["clients"])
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        errors = [row for row in collected if isinstance(row, Exception)]
+        if errors:
+            # Причина - ошибка упавшего клиента, а не сломанный барьер
+            # у остальных.
+            error = next(
+                (e for e in errors if not isinstance(e, BrokenBarrierError)),
+                errors[0],
+            )
+            raise CommandError(f"Клиент не запустился: {error!r}")
+        samples = {route: [] for route in routes}
+        for _, client_samples in collected:
+            for route, rows in client_samples.items():
+                samples[route].extend(rows)
+        return max(row[0] for row in collected), samples
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счётчики постов, подписчиков, подписок "
+        "и комментариев по данным в базе"
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users = counters.rebuild_users()
+            posts = counters.rebuild_comments()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Пересчитано пользователей: {users}, постов: {posts}"
+            )
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Перестраивает полнотекстовый индекс постов по данным в базе"
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError(
+                "Полнотекстовый поиск работает только на SQLite"
+            )
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Проиндексировано постов: {Post.objects.count()}"
+            )
+        )
@@ -0,0 +1,150 @@
+import argparse
+import datetime as dt
+import multiprocessing
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts import thumbnails
+from posts.models import Post
+
+CHECKPOINT = os.path.join("cache", ".warm_thumbnails")
+
+
+def since_type(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise argparse.ArgumentTypeError(
+                "Ожидается дата YYYY-MM-DD или дата и время в ISO 8601"
+            )
+        moment = dt.datetime.combine(day, dt.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _warm(item):
+    """Миниатюры одной картинки; выполняется в процессе пула."""
+    post_id, name = item
+    started = time.perf_counter()
+    try:
+        ready = thumbnails.create(name)
+    except Exception:
+        ready = False
+    return post_id, ready, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Заранее создаёт миниатюры картинок постов, которые выводят "
+        "шаблоны, в пуле процессов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Процессов в пуле (0 - в текущем процессе)",
+        )
+        parser.add_argument(
+            "--since",
+            type=since_type,
+            help="Только посты, опубликованные не раньше этой даты",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Продолжить с поста, на котором остановился прошлый запуск",
+        )
+        parser.add_argument(
+            "--progress",
+            type=int,
+            default=100,
+            help="Печатать прогресс каждые N картинок",
+        )
+
+    def checkpoint_path(self):
+        # Контрольная точка лежит рядом с миниатюрами: если их кеш
+        # стёрли, вместе с ним пропадает и она.
+        return os.path.join(settings.MEDIA_ROOT, CHECKPOINT)
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path()) as file:
+                return int(file.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def write_checkpoint(self, post_id):
+        path = self.checkpoint_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w") as file:
+            file.write(str(post_id))
+        os.replace(path + ".tmp", path)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image="").exclude(image__isnull=True)
+        if options["since"]:
+            posts = posts.filter(pub_date__gte=options["since"])
+        start = self.read_checkpoint() if options["resume"] else 0
+        if start:
+            posts = posts.filter(id__gt=start)
+            self.stdout.write(f"Продолжаем после поста {start}")
+        items = list(posts.order_by("id").values_list("id", "image"))
+        total = len(items)
+        if not total:
+            self.stdout.write("Картинок для обработки нет")
+            return
+
+        workers = options["workers"]
+        pool = None
+        if workers:
+            # Открытые соединения не должны достаться форкам.
+            connections.close_all()
+            pool = multiprocessing.get_context("fork").Pool(workers)
+            results = pool.imap(_warm, items, chunksize=4)
+        else:
+            results = map(_warm, items)
+
+        done = failed = last = 0
+        busy = 0.0
+        started = time.perf_counter()
+        try:
+            # imap отдаёт результаты по порядку id: всё до текущего
+            # поста уже обработано, и его можно записать как точку.
+            for post_id, ready, seconds in results:
+                done, last = done + 1, post_id
+                busy += seconds
+                if not ready:
+                    failed += 1
+                    self.stderr.write(f"Пост {post_id}: картинка не читается")
+                if done % options["progress"] == 0 or done == total:
+                    self.write_checkpoint(post_id)
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"{done}/{total} ({done / total:.0%}), "
+                        f"{done / elapsed:.1f} картинок/с"
+                    )
+        finally:
+            if last:
+                self.write_checkpoint(last)
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Готово: {done - failed} картинок, ошибок: {failed}, "
+                f"{elapsed:.1f} с, {done / elapsed:.1f} картинок/с "
+                f"(в среднем {busy / done * 1000:.0f} мс на картинку)"
+            )
+        )
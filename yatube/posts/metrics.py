@@ -0,0 +1,350 @@
+"""Метрики запросов в формате Prometheus, общие для всех воркеров.
+
+``MetricsMiddleware`` считает по имени маршрута запросы и статусы,
+гистограмму времени ответа, SQL-запросы и попадания в кеш (их собирает
+таймер ``posts/timing.py``). Каждый процесс пишет в свой файл
+``METRICS_DIR/<pid>.metrics``, отображённый в память: запись - это
+прибавление к числу в памяти, без блокировок между процессами и без
+системных вызовов. ``/metrics/`` складывает файлы всех процессов.
+
+Файл устроен как журнал: 8 байт - сколько байт занято, дальше записи
+``[длина ключа][ключ][выравнивание][double]``. Ключ - строка образца
+Prometheus вместе с метками. Новая запись сначала пишется целиком, а
+потом сдвигается счётчик занятого, так что читатель не видит
+недописанных записей.
+
+Файлы завершившихся процессов сливаются в ``archive.metrics``, когда
+открывает файл новый процесс, поэтому счётчики не сбрасываются при
+перезапуске воркеров, а файлов не становится больше, чем воркеров.
+"""
+import fcntl
+import mmap
+import os
+import re
+import struct
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.crypto import constant_time_compare
+
+from . import timing
+
+USED = struct.Struct("Q")
+LENGTH = struct.Struct("I")
+VALUE = struct.Struct("d")
+INITIAL_SIZE = 64 * 1024
+SUFFIX = ".metrics"
+ARCHIVE = "archive" + SUFFIX
+LOCK = ".lock"
+
+# Границы корзин гистограммы времени ответа, секунды.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Прочие методы сводятся в "other": метка не должна зависеть от клиента.
+METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+
+FAMILIES = {
+    "yatube_requests_total": (
+        "counter",
+        "Запросы по маршруту, методу и статусу ответа",
+    ),
+    "yatube_request_duration_seconds": (
+        "histogram",
+        "Время ответа по маршруту",
+    ),
+    "yatube_request_queries_total": (
+        "counter",
+        "SQL-запросы, выполненные при ответах маршрута",
+    ),
+    "yatube_cache_requests_total": (
+        "counter",
+        "Обращения к кешу страниц и карточек: hit или miss",
+    ),
+}
+HISTOGRAM_SUFFIXES = ("_bucket", "_sum", "_count")
+LE = re.compile(r'le="([^"]+)"')
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _aligned(size):
+    return -(-size // VALUE.size) * VALUE.size
+
+
+def _entries(buffer):
+    """(ключ, смещение значения) для каждой записи файла."""
+    used = max(USED.unpack_from(buffer)[0], USED.size)
+    offset = USED.size
+    while offset < used:
+        (length,) = LENGTH.unpack_from(buffer, offset)
+        start = offset + LENGTH.size
+        key = bytes(buffer[start:start + length]).decode()
+        value_offset = offset + _aligned(LENGTH.size + length)
+        yield key, value_offset
+        offset = value_offset + VALUE.size
+
+
+def read(path):
+    """Значения из файла метрик: {ключ: число}."""
+    with open(path, "rb") as file:
+        data = file.read()
+    if len(data) < USED.size:
+        return {}
+    return {
+        key: VALUE.unpack_from(data, offset)[0]
+        for key, offset in _entries(data)
+    }
+
+
+class Store:
+    """Файл метрик одного процесса."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size < INITIAL_SIZE:
+            os.ftruncate(self._fd, INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self._map = mmap.mmap(self._fd, size)
+        self._offsets = dict(_entries(self._map))
+
+    def add(self, key, amount=1):
+        with self._lock:
+            offset = self._offsets.get(key)
+            if offset is None:
+                offset = self._offsets[key] = self._append(key)
+            (value,) = VALUE.unpack_from(self._map, offset)
+            VALUE.pack_into(self._map, offset, value + amount)
+
+    def _append(self, key):
+        data = key.encode()
+        used = max(USED.unpack_from(self._map)[0], USED.size)
+        value_offset = used + _aligned(LENGTH.size + len(data))
+        end = value_offset + VALUE.size
+        if end > len(self._map):
+            self._grow(end)
+        LENGTH.pack_into(self._map, used, len(data))
+        start = used + LENGTH.size
+        self._map[start:start + len(data)] = data
+        VALUE.pack_into(self._map, value_offset, 0.0)
+        USED.pack_into(self._map, 0, end)
+        return value_offset
+
+    def _grow(self, needed):
+        size = len(self._map)
+        while size < needed:
+            size *= 2
+        os.ftruncate(self._fd, size)
+        self._map.resize(size)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+@contextmanager
+def _locked(directory, operation):
+    fd = os.open(os.path.join(directory, LOCK), os.O_RDWR | os.O_CREAT)
+    try:
+        fcntl.flock(fd, operation)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _process_files(directory):
+    """{pid: путь} для файлов процессов в каталоге."""
+    files = {}
+    for name in os.listdir(directory):
+        pid = name[:-len(SUFFIX)]
+        if name.endswith(SUFFIX) and pid.isdigit():
+            files[int(pid)] = os.path.join(directory, name)
+    return files
+
+
+def _archive_dead(directory):
+    """Слить файлы завершившихся процессов в архив и удалить их."""
+    dead = [
+        path
+        for pid, path in _process_files(directory).items()
+        if pid != os.getpid() and not _alive(pid)
+    ]
+    if not dead:
+        return
+    archive = Store(os.path.join(directory, ARCHIVE))
+    try:
+        for path in dead:
+            for key, value in read(path).items():
+                archive.add(key, value)
+            os.remove(path)
+    finally:
+        archive.close()
+
+
+_store = None
+# (pid, каталог), для которых открыт _store.
+_owner = None
+_open_lock = threading.Lock()
+
+
+def _current_store():
+    """Файл текущего процесса (после fork - новый)."""
+    global _store, _owner
+    owner = (os.getpid(), settings.METRICS_DIR)
+    if _owner == owner:
+        return _store
+    with _open_lock:
+        if _owner != owner:
+            directory = settings.METRICS_DIR
+            os.makedirs(directory, exist_ok=True)
+            with _locked(directory, fcntl.LOCK_EX):
+                _archive_dead(directory)
+                path = os.path.join(directory, f"{os.getpid()}{SUFFIX}")
+                _store, _owner = Store(path), owner
+    return _store
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def sample(name, **labels):
+    """Ключ образца: имя и метки в текстовом формате Prometheus."""
+    if not labels:
+        return name
+    pairs = ",".join(
+        f'{label}="{_escape(value)}"' for label, value in labels.items()
+    )
+    return f"{name}{{{pairs}}}"
+
+
+def observe(store, name, value, **labels):
+    """Учесть значение в гистограмме: накопительные корзины, сумма и
+    число наблюдений."""
+    for bound in BUCKETS:
+        # И нулевые корзины: у гистограммы должны быть все границы.
+        store.add(
+            sample(f"{name}_bucket", **labels, le=bound), int(value <= bound)
+        )
+    store.add(sample(f"{name}_bucket", **labels, le="+Inf"))
+    store.add(sample(f"{name}_sum", **labels), value)
+    store.add(sample(f"{name}_count", **labels))
+
+
+def record(request, response, timer, elapsed):
+    store = _current_store()
+    match = request.resolver_match
+    view = match.view_name if match else "none"
+    method = request.method if request.method in METHODS else "other"
+    store.add(
+        sample(
+            "yatube_requests_total",
+            view=view,
+            method=method,
+            status=response.status_code,
+        )
+    )
+    observe(store, "yatube_request_duration_seconds", elapsed, view=view)
+    store.add(
+        sample("yatube_request_queries_total", view=view),
+        timer.counts["db"],
+    )
+    for result, counter in (("hit", "cache_hits"), ("miss", "cache_misses")):
+        if timer.counts[counter]:
+            store.add(
+                sample(
+                    "yatube_cache_requests_total", view=view, result=result
+                ),
+                timer.counts[counter],
+            )
+
+
+def collect(directory):
+    """Сумма значений по всем файлам каталога."""
+    totals = {}
+    if not os.path.isdir(directory):
+        return totals
+    with _locked(directory, fcntl.LOCK_SH):
+        paths = list(_process_files(directory).values())
+        archive = os.path.join(directory, ARCHIVE)
+        if os.path.exists(archive):
+            paths.append(archive)
+        for path in paths:
+            for key, value in read(path).items():
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _family(key):
+    name = key.split("{", 1)[0]
+    if name not in FAMILIES:
+        for suffix in HISTOGRAM_SUFFIXES:
+            if name.endswith(suffix):
+                return name[:-len(suffix)]
+    return name
+
+
+def _order(key):
+    """Порядок строк: по имени и меткам, корзины - по границе."""
+    match = LE.search(key)
+    bound = float(match.group(1)) if match else 0
+    return LE.sub("", key), bound
+
+
+def _number(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def render(directory=None):
+    """Все метрики в текстовом формате Prometheus 0.0.4."""
+    totals = collect(directory or settings.METRICS_DIR)
+    by_family = {}
+    for key in sorted(totals, key=_order):
+        by_family.setdefault(_family(key), []).append(key)
+    lines = []
+    for family, (kind, description) in FAMILIES.items():
+        lines.append(f"# HELP {family} {description}")
+        lines.append(f"# TYPE {family} {kind}")
+        for key in by_family.get(family, []):
+            lines.append(f"{key} {_number(totals[key])}")
+    return "\n".join(lines) + "\n"
+
+
+def allowed(request):
+    """Метрики видят сотрудники и сборщик с ``Authorization: Bearer``
+    и токеном ``METRICS_TOKEN``."""
+    if request.user.is_staff:
+        return True
+    token = getattr(settings, "METRICS_TOKEN", "")
+    return bool(token) and constant_time_compare(
+        request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {token}"
+    )
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_DIR", None):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with timing.request_timer() as timer:
+            response = self.get_response(request)
+        record(request, response, timer, timer.total())
+        return response
@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:42
+
+from django.db import migrations, models
+from django.db.models import F
+
+from posts import search
+
+
+def fill_updated(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Post.objects.update(updated=F('pub_date'))
+    Comment.objects.update(updated=F('created'))
+
+
+def reinstall_search(apps, schema_editor):
+    # SQLite добавляет столбец, пересоздавая таблицу posts_post, и
+    # триггеры поискового индекса пропадают вместе со старой таблицей.
+    search.install(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_search_index'),
+    ]
+
+    operations = [
+        # При откате столбцы удаляются тоже через пересоздание таблицы,
+        # поэтому триггеры восстанавливаются и в самом конце отката.
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search),
+        migrations.AddField(
+            model_name='comment',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='date updated'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='date updated'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'updated'], name='comment_post_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'updated'], name='post_author_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'updated'], name='post_group_updated_idx'),
+        ),
+        migrations.RunPython(fill_updated, migrations.RunPython.noop),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:32
+
+from django.db import migrations, models
+
+from posts import prerender, search
+
+BATCH_SIZE = 1000
+
+
+def fill_prerendered(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    queryset = Post.objects.order_by('pk').only('pk', 'text')
+    last = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last)[:BATCH_SIZE])
+        if not batch:
+            break
+        for post in batch:
+            prerender.fill(post)
+        Post.objects.bulk_update(batch, prerender.FIELDS)
+        last = batch[-1].pk
+
+
+def reinstall_search(apps, schema_editor):
+    # SQLite добавляет столбец, пересоздавая таблицу posts_post, и
+    # триггеры поискового индекса пропадают вместе со старой таблицей.
+    search.install(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search),
+        migrations.AddField(
+            model_name='post',
+            name='preview',
+            field=models.CharField(default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='preview_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+        migrations.RunPython(fill_prerendered, migrations.RunPython.noop),
+    ]
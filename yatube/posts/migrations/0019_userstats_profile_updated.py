@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_prerendered_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='profile_updated',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='profile updated'),
+        ),
+    ]
@@ -1,9 +1,26 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
+from . import prerender
+
 User = get_user_model()
 
 
+class AtomicSaveModel(models.Model):
+    """Сохраняет запись в одной транзакции с обработчиками post_save.
+
+    Счётчики и лента обновляются сигналами; без общей транзакции запись
+    могла бы сохраниться, а счётчик - нет.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200, blank=True, null=True)
     slug = models.SlugField(max_length=20, unique=True)
@@ -16,7 +33,7 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class Post(AtomicSaveModel):
     text = models.TextField()
     pub_date = models.DateTimeField(
         "date published", auto_now_add=True, db_index=True
@@ -32,16 +49,53 @@ class Post(models.Model):
         related_name="posts",
     )
     image = models.ImageField(upload_to="posts/", blank=True, null=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    updated = models.DateTimeField("date updated", auto_now=True)
+    # Производные от text, считаются в save() (см. posts/prerender.py).
+    text_html = models.TextField(default="", editable=False)
+    preview = models.CharField(
+        max_length=prerender.PREVIEW_LENGTH, default="", editable=False
+    )
+    preview_html = models.TextField(default="", editable=False)
 
     class Meta:
         verbose_name_plural = "Посты"
         ordering = ("-pub_date",)
+        indexes = [
+            # Ленты автора и группы: WHERE author/group ORDER BY pub_date,
+            # id - id SQLite хранит в конце каждого индекса.
+            models.Index(
+                fields=["author", "pub_date"], name="post_author_pub_date_idx"
+            ),
+            models.Index(
+                fields=["group", "pub_date"], name="post_group_pub_date_idx"
+            ),
+            # Для валидаторов условного GET: max(updated) автора или группы.
+            models.Index(
+                fields=["author", "updated"], name="post_author_updated_idx"
+            ),
+            models.Index(
+                fields=["group", "updated"], name="post_group_updated_idx"
+            ),
+        ]
 
     def __str__(self):
-        return self.text[:15]
+        # В лентах text не загружен, а превью начинается с него же.
+        return (self.preview or self.text)[:15]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "text" in update_fields:
+            self.prerender()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *prerender.FIELDS}
+        super().save(*args, **kwargs)
 
+    def prerender(self):
+        prerender.fill(self)
 
-class Comment(models.Model):
+
+class Comment(AtomicSaveModel):
     post = models.ForeignKey(
         Post, on_delete=models.CASCADE, related_name="comments"
     )
@@ -50,9 +104,20 @@ class Comment(models.Model):
     )
     text = models.TextField("Текст", help_text="Текст нового комментария")
     created = models.DateTimeField("date published", auto_now_add=True)
+    updated = models.DateTimeField("date updated", auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["post", "created"], name="comment_post_created_idx"
+            ),
+            models.Index(
+                fields=["post", "updated"], name="comment_post_updated_idx"
+            ),
+        ]
 
-class Follow(models.Model):
+
+class Follow(AtomicSaveModel):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="follower"
     )
@@ -66,3 +131,70 @@ class Follow(models.Model):
                 fields=["user", "author"], name="unique_pair"
             )
         ]
+        # Подписчики автора (рассылка в ленты, счётчики) - без обращения
+        # к таблице.
+        indexes = [
+            models.Index(
+                fields=["author", "user"], name="follow_author_user_idx"
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые поддерживаются сигналами.
+
+    Профиль и страница поста выводят их вместе с автором, без отдельных
+    ``COUNT`` запросов. Пересчитать с нуля: ``manage.py rebuild_counters``.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    post_count = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Когда менялись имя и другие данные пользователя, которые выводятся
+    # рядом с его постами: по нему ETag лент видит переименование автора.
+    profile_updated = models.DateTimeField(
+        "profile updated", null=True, editable=False
+    )
+
+    class Meta:
+        verbose_name_plural = "Статистика пользователей"
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя.
+
+    Заполняется при публикации поста (fan-out on write), поэтому
+    ``follow_index`` читает страницу ленты одним диапазонным сканом
+    индекса ``(user, pub_date, post)``. ``author`` и ``pub_date``
+    продублированы из поста для отписки и сортировки без JOIN.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="timeline"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+"
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_timeline_entry"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "pub_date", "post"],
+                name="timeline_user_date_idx",
+            ),
+            models.Index(
+                fields=["user", "author"], name="timeline_user_author_idx"
+            ),
+        ]
@@ -0,0 +1,118 @@
+"""Кеш страниц с тегами и инвалидацией по событиям.
+
+Представление помечает страницу тегами (``index``, ``group:<id>``,
+``author:<id>``, ``post:<id>``) через ``tag_request()``. Вместе со
+страницей в кеше лежат версии её тегов на момент рендера. Сигналы
+моделей сдвигают версии тегов (``bump()``), и устаревшая страница
+перестаёт совпадать - поэтому таймаут может быть долгим, а новый пост
+виден сразу.
+"""
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (
+    get_cache_key,
+    get_conditional_response,
+    learn_cache_key,
+    patch_vary_headers,
+)
+from django.utils.http import parse_http_date_safe
+
+from . import timing
+
+KEY_PREFIX = "tagged_page"
+
+
+def _tag_key(tag):
+    return f"tag:{tag}"
+
+
+def bump(*tags):
+    """Сдвинуть версии тегов: все помеченные ими страницы устаревают."""
+    with timing.measure("cache"):
+        cache.set_many(
+            {_tag_key(tag): uuid.uuid4().hex for tag in tags}, timeout=None
+        )
+
+
+def _versions(tags):
+    keys = [_tag_key(tag) for tag in tags]
+    with timing.measure("cache"):
+        stored = cache.get_many(keys)
+    timing.cache_lookup(keys, stored)
+    missing = [key for key in keys if key not in stored]
+    if missing:
+        # Тег ещё не сдвигали или кеш его вытеснил: версия None совпала
+        # бы с None, сохранённым вместе со страницей раньше, и страница
+        # пережила бы сдвиг. Новая версия делает такие страницы промахом.
+        with timing.measure("cache"):
+            for key in missing:
+                cache.add(key, uuid.uuid4().hex, timeout=None)
+            stored.update(cache.get_many(missing))
+    return {tag: stored.get(_tag_key(tag)) for tag in tags}
+
+
+def tag_request(request, *tags):
+    """Пометить кешируемую страницу тегами.
+
+    Версии читаются сразу, до выборки данных: если пост появится во
+    время рендера, страница сохранится уже устаревшей, а не свежей.
+    """
+    tag_versions = getattr(request, "cache_tags", None)
+    if tag_versions is not None:
+        tag_versions.update(_versions(tags))
+
+
+def cache_page_tagged(timeout=None):
+    """Аналог ``cache_page``, но с инвалидацией по тегам."""
+    timeout = settings.PAGE_CACHE_TIMEOUT if timeout is None else timeout
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            key = get_cache_key(request, KEY_PREFIX, "GET", cache=cache)
+            entry = None
+            if key:
+                with timing.measure("cache"):
+                    entry = cache.get(key)
+                timing.cache_lookup([key], [entry] if entry else [])
+            if entry is not None:
+                response, tag_versions = entry
+                if _versions(tag_versions) == tag_versions:
+                    # Валидаторы страницы сохранены вместе с ней и
+                    # актуальны, пока актуальны версии тегов.
+                    return get_conditional_response(
+                        request,
+                        etag=response.get("ETag"),
+                        last_modified=parse_http_date_safe(
+                            response.get("Last-Modified", "")
+                        ),
+                        response=response,
+                    )
+            request.cache_tags = {}
+            response = view(request, *args, **kwargs)
+            if (
+                response.status_code == 200
+                and not response.streaming
+                and request.cache_tags
+            ):
+                # SessionMiddleware добавит Vary: Cookie уже после
+                # декоратора, а ключ кеша должен его учитывать.
+                if getattr(request, "session", None) is not None and (
+                    request.session.accessed
+                ):
+                    patch_vary_headers(response, ("Cookie",))
+                key = learn_cache_key(
+                    request, response, timeout, KEY_PREFIX, cache=cache
+                )
+                with timing.measure("cache"):
+                    cache.set(key, (response, request.cache_tags), timeout)
+            return response
+
+        return wrapper
+
+    return decorator
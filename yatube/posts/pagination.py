@@ -0,0 +1,179 @@
+import base64
+import datetime as dt
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по паре полей (по умолчанию ``pub_date``, ``id``).
+
+    Вместо ``COUNT(*)`` и ``OFFSET`` каждая страница выбирается одним
+    запросом ``WHERE (pub_date, id) < курсор LIMIT per_page + 1``, поэтому
+    глубокие страницы стоят столько же, сколько первая. Курсоры - непрозрачные
+    токены для параметров ``?after=`` (более старые записи) и ``?before=``
+    (более новые). Обычный ``page()``/``get_page()`` продолжает работать
+    для ссылок вида ``?page=N``.
+    """
+
+    def __init__(self, object_list, per_page, keys=("pub_date", "id")):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.cursor_mode = False
+        self._cursor_num_pages = None
+
+    @cached_property
+    def num_pages(self):
+        if self._cursor_num_pages is not None:
+            return self._cursor_num_pages
+        return super().num_pages
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, key) for key in self.keys]
+        # isoformat() без усечения до миллисекунд, как у DjangoJSONEncoder:
+        # курсор должен совпадать с pub_date до микросекунды.
+        values = [
+            value.isoformat() if isinstance(value, dt.datetime) else value
+            for value in values
+        ]
+        raw = json.dumps(values).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, token):
+        """Вернуть значения ключей из токена или None, если он испорчен."""
+        if not token:
+            return None
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if len(values) != len(self.keys):
+                return None
+            return [
+                self._to_python(key, value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def _to_python(self, key, value):
+        """Привести значение из курсора к типу поля модели.
+
+        Ключи-аннотации (например, релевантность поиска) полей модели не
+        имеют и остаются как есть после JSON.
+        """
+        try:
+            field = self.object_list.model._meta.get_field(key)
+        except FieldDoesNotExist:
+            if not isinstance(value, (int, float)):
+                raise TypeError(key)
+            return value
+        return field.to_python(value)
+
+    def _seek(self, values, newer, keys=None):
+        """Условие «строго после курсора» для сортировки по убыванию."""
+        keys = keys or self.keys
+        lookup = "gt" if newer else "lt"
+        condition = Q()
+        for i, key in enumerate(keys):
+            equal = {keys[j]: values[j] for j in range(i)}
+            condition |= Q(**equal, **{f"{key}__{lookup}": values[i]})
+        return condition
+
+    def _rows(self, values, newer, limit):
+        """Первые ``limit`` записей за курсором.
+
+        При ``newer`` записи идут по возрастанию ключа (к началу ленты),
+        иначе - по убыванию. Без курсора отдаётся начало ленты.
+        """
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, newer))
+        ordering = self.keys if newer else [f"-{key}" for key in self.keys]
+        return list(queryset.order_by(*ordering)[:limit])
+
+    def get_cursor_page(self, after=None, before=None):
+        """Вернуть страницу относительно курсора.
+
+        Невалидный курсор, как и невалидный номер у ``get_page()``,
+        приводит к первой странице.
+        """
+        values = self.decode_cursor(before)
+        if values is not None:
+            rows = self._rows(values, newer=True, limit=self.per_page + 1)
+            if len(rows) > self.per_page:
+                return self._build_page(
+                    rows[: self.per_page][::-1],
+                    has_previous=True,
+                    has_next=True,
+                )
+            # Дошли до начала ленты: отдаём полноценную первую страницу.
+            return self.get_cursor_page()
+        values = self.decode_cursor(after)
+        rows = self._rows(values, newer=False, limit=self.per_page + 1)
+        has_next = len(rows) > self.per_page
+        return self._build_page(
+            rows[: self.per_page],
+            has_previous=values is not None,
+            has_next=has_next,
+            anchor=after,
+        )
+
+    def _build_page(self, rows, has_previous, has_next, anchor=None):
+        self.cursor_mode = True
+        number = 2 if has_previous else 1
+        self._cursor_num_pages = number + 1 if has_next else number
+        self.__dict__.pop("num_pages", None)
+        page = Page(rows, number, self)
+        page.previous_cursor = None
+        if has_previous:
+            # На пустой странице за последней записью назад ведёт сам курсор.
+            page.previous_cursor = (
+                self.encode_cursor(rows[0]) if rows else anchor
+            )
+        page.next_cursor = (
+            self.encode_cursor(rows[-1]) if has_next and rows else None
+        )
+        return page
+
+
+class AscendingCursorPaginator(CursorPaginator):
+    """Курсоры по возрастанию ключей: следующая страница (``?after=``) -
+    записи с большими ключами."""
+
+    def _rows(self, values, newer, limit):
+        # newer - к началу списка, здесь это меньшие ключи.
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, not newer))
+        ordering = [f"-{key}" for key in self.keys] if newer else self.keys
+        return list(queryset.order_by(*ordering)[:limit])
+
+
+class CommentPaginator(AscendingCursorPaginator):
+    """Курсоры по комментариям: они идут от старых к новым, и следующая
+    страница (``?after=``) - более новые комментарии."""
+
+    def __init__(self, object_list, per_page, keys=("created", "id")):
+        super().__init__(object_list, per_page, keys)
+
+
+def paginate(
+    request,
+    queryset,
+    per_page=POSTS_PER_PAGE,
+    paginator_class=CursorPaginator,
+    **kwargs,
+):
+    """Страница ленты: по курсору, либо по номеру для старых ссылок ?page=."""
+    paginator = paginator_class(queryset, per_page, **kwargs)
+    if "page" in request.GET:
+        return paginator.get_page(request.GET.get("page"))
+    return paginator.get_cursor_page(
+        after=request.GET.get("after"), before=request.GET.get("before")
+    )
@@ -0,0 +1,68 @@
+"""Компиляция всех шаблонов проекта заранее.
+
+``compile_all()`` разбирает каждый файл из каталогов шаблонов - общих
+(``DIRS``) и каталогов приложений - через загрузчики движка. С
+``cached.Loader`` разобранные шаблоны остаются в его кеше, и первые
+запросы воркера не тратят время на разбор; без него проверяется только
+синтаксис. Вызывается при старте (``yatube/wsgi.py``) и командой
+``manage.py compile_templates``.
+"""
+import os
+
+from django.template import Engine, TemplateSyntaxError
+
+
+class TemplateErrors(Exception):
+    """Шаблоны с ошибками синтаксиса: {имя: исключение}."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(
+            "Ошибки в шаблонах:\n"
+            + "\n".join(f"{name}: {error}" for name, error in errors.items())
+        )
+
+
+def template_dirs(engine):
+    """Каталоги, в которых ищут шаблоны загрузчики движка, по порядку."""
+    dirs = []
+    for loader in engine.template_loaders:
+        # cached.Loader оборачивает другие загрузчики.
+        for inner in getattr(loader, "loaders", [loader]):
+            for directory in inner.get_dirs():
+                if directory not in dirs:
+                    dirs.append(directory)
+    return dirs
+
+
+def template_names(engine):
+    """Имена всех файлов шаблонов; из одинаковых берётся первое."""
+    names = []
+    for directory in template_dirs(engine):
+        for root, subdirs, files in os.walk(directory):
+            subdirs[:] = sorted(d for d in subdirs if not d.startswith("."))
+            for file in sorted(files):
+                if file.startswith("."):
+                    continue
+                path = os.path.relpath(os.path.join(root, file), directory)
+                names.append(path.replace(os.sep, "/"))
+    return list(dict.fromkeys(names))
+
+
+def compile_all(engine=None):
+    """Скомпилировать все шаблоны; вернуть их число.
+
+    Ошибки синтаксиса собираются по всем шаблонам и поднимаются одним
+    ``TemplateErrors``.
+    """
+    engine = engine or Engine.get_default()
+    names = template_names(engine)
+    errors = {}
+    for name in names:
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError as error:
+            errors[name] = error
+    if errors:
+        raise TemplateErrors(errors)
+    return len(names)
@@ -0,0 +1,30 @@
+"""HTML текста поста и его превью, рассчитанные при сохранении.
+
+Ленты выводят превью - начало текста не длиннее ``PREVIEW_LENGTH``
+символов, - и читают из базы только его: полный ``text`` и
+``text_html`` нужны лишь странице поста. HTML получается тем же
+фильтром ``linebreaksbr`` с экранированием, что раньше применялся при
+каждом рендере, поэтому его можно выводить без повторной обработки.
+"""
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+PREVIEW_LENGTH = 300
+# Колонки, которые ленты не читают (``defer()``).
+FULL_TEXT_FIELDS = ("text", "text_html")
+FIELDS = ("text_html", "preview", "preview_html")
+
+
+def to_html(text):
+    return linebreaksbr(text, autoescape=True)
+
+
+def fill(post):
+    """Заполнить производные поля поста по его ``text``.
+
+    Принимает и историческую модель из миграции: методов модели не
+    использует.
+    """
+    post.preview = Truncator(post.text).chars(PREVIEW_LENGTH)
+    post.text_html = to_html(post.text)
+    post.preview_html = to_html(post.preview)
@@ -0,0 +1,42 @@
+"""Повтор пишущих представлений, когда SQLite занята.
+
+``busy_timeout`` заставляет писателя ждать блокировку, но ожидание
+ограничено, и под нагрузкой запрос всё равно может получить
+``database is locked``. Декоратор выполняет представление в одной
+транзакции и при такой ошибке повторяет его целиком - после отката
+повтор безопасен - с растущей паузой со случайным разбросом, чтобы
+столкнувшиеся писатели не просыпались одновременно.
+"""
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+
+def is_locked(error):
+    # "database is locked", а в общей памяти (тесты) - "table is locked".
+    return "is locked" in str(error)
+
+
+def retry_on_locked(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        # Внутри чужой транзакции блокировки уже взяты: повтор здесь
+        # не поможет, ошибку должен обработать владелец транзакции.
+        if connection.in_atomic_block:
+            return view(request, *args, **kwargs)
+        attempts = settings.DB_RETRY_ATTEMPTS
+        delay = settings.DB_RETRY_BACKOFF
+        for attempt in range(1, attempts + 1):
+            try:
+                with transaction.atomic():
+                    return view(request, *args, **kwargs)
+            except OperationalError as error:
+                if attempt == attempts or not is_locked(error):
+                    raise
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay *= 2
+
+    return wrapper
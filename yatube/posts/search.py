@@ -0,0 +1,155 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Виртуальная таблица ``posts_post_fts`` хранит только индекс по
+``Post.text`` (external content): сам текст читается из ``posts_post``.
+Индекс поддерживают триггеры на вставку, удаление и изменение текста,
+так что он обновляется и при ``bulk_create``/``update()``, минуя сигналы.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .pagination import CursorPaginator
+
+TABLE = "posts_post_fts"
+# Маркеры подсветки в сниппете: управляющие символы не встречаются в
+# тексте постов и переживают экранирование HTML.
+MARK_START, MARK_END = "\x02", "\x03"
+SNIPPET_TOKENS = 24
+
+INSTALL_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    " text, content='posts_post', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLE}_insert AFTER INSERT ON posts_post "
+    f"BEGIN INSERT INTO {TABLE} (rowid, text) VALUES (new.id, new.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLE}_delete AFTER DELETE ON posts_post "
+    f"BEGIN INSERT INTO {TABLE} ({TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLE}_update "
+    "AFTER UPDATE OF text ON posts_post "
+    f"BEGIN INSERT INTO {TABLE} ({TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {TABLE} (rowid, text) VALUES (new.id, new.text); END",
+)
+UNINSTALL_SQL = (
+    f"DROP TRIGGER IF EXISTS {TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {TABLE}_update",
+    f"DROP TABLE IF EXISTS {TABLE}",
+)
+
+
+def is_supported(using=connection):
+    return using.vendor == "sqlite"
+
+
+def install(using=connection):
+    """Создать индекс и триггеры, если их ещё нет.
+
+    Миграции, пересоздающие таблицу ``posts_post`` (так SQLite меняет
+    столбцы), теряют триггеры - такие миграции должны вызвать это снова.
+    """
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        for statement in INSTALL_SQL:
+            cursor.execute(statement)
+
+
+def uninstall(using=connection):
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        for statement in UNINSTALL_SQL:
+            cursor.execute(statement)
+
+
+def rebuild(using=connection):
+    """Перестроить индекс по текущему содержимому ``posts_post``."""
+    install(using)
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(query):
+    """Превратить ввод пользователя в безопасный запрос MATCH.
+
+    Каждое слово берётся в кавычки (синтаксис FTS5 - AND, NEAR, ``*``,
+    ``:`` - не интерпретируется) и ищется как префикс. Слова
+    объединяются по И. Пустая строка - если слов нет.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+
+def filter_matching(queryset, query):
+    """Оставить в запросе постов только подходящие под ``query``.
+
+    Через ``extra()``: ``RawSQL`` в ``id__in`` Django берёт в двойные
+    скобки, и SQLite считает подзапрос скалярным - остаётся одна строка.
+    """
+    return queryset.extra(
+        where=[
+            f"{queryset.model._meta.db_table}.id IN "
+            f"(SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s)"
+        ],
+        params=[match_expression(query)],
+    )
+
+
+def highlight(snippet):
+    """HTML сниппета: текст экранирован, совпадения - в ``<mark>``."""
+    html = escape(snippet)
+    return mark_safe(
+        html.replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорная пагинация результатов поиска по релевантности.
+
+    Ключ курсора - пара (``rank``, ``id``), где ``rank`` - bm25 из FTS5:
+    чем меньше, тем релевантнее, поэтому «следующая» страница идёт по
+    возрастанию. Страница выбирается одним запросом к индексу и одним
+    ``in_bulk`` к ``object_list``; у постов появляются атрибуты ``rank``
+    и ``snippet`` (готовый HTML).
+    """
+
+    def __init__(self, object_list, per_page, query):
+        super().__init__(object_list, per_page, keys=("rank", "id"))
+        self.match = match_expression(query)
+
+    def _rows(self, values, newer, limit):
+        if not self.match:
+            return []
+        sql = (
+            "SELECT id, rank, snippet FROM ("
+            f" SELECT rowid AS id, bm25({TABLE}) AS rank,"
+            f" snippet({TABLE}, 0, %s, %s, '…', %s) AS snippet"
+            f" FROM {TABLE} WHERE {TABLE} MATCH %s)"
+        )
+        params = [MARK_START, MARK_END, SNIPPET_TOKENS, self.match]
+        if values is not None:
+            sql += " WHERE (rank, id) {} (%s, %s)".format(
+                "<" if newer else ">"
+            )
+            params += values
+        direction = "DESC" if newer else "ASC"
+        sql += f" ORDER BY rank {direction}, id {direction} LIMIT %s"
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            found = cursor.fetchall()
+        posts = self.object_list.in_bulk([row[0] for row in found])
+        rows = []
+        for post_id, rank, snippet in found:
+            # Пост мог быть удалён между двумя запросами.
+            post = posts.get(post_id)
+            if post is not None:
+                post.rank, post.snippet = rank, highlight(snippet)
+                rows.append(post)
+        return rows
@@ -0,0 +1,102 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters, follows, page_cache, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def post_tags(post):
+    tags = {"index", f"post:{post.id}", f"author:{post.author_id}"}
+    for group_id in (post.group_id, getattr(post, "_old_group_id", None)):
+        if group_id is not None:
+            tags.add(f"group:{group_id}")
+    return tags
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, update_fields=None, **kwargs):
+    # При каждом входе сохраняется last_login - страницы от этого не меняются.
+    if update_fields and set(update_fields) == {"last_login"}:
+        return
+    UserStats.objects.filter(user=instance).update(
+        profile_updated=timezone.now()
+    )
+    # Имя автора выводится и в лентах сообществ, где он публиковался.
+    group_ids = (
+        Post.objects.filter(author=instance, group__isnull=False)
+        .order_by()
+        .values_list("group_id", flat=True)
+        .distinct()
+    )
+    page_cache.bump(
+        "index",
+        f"author:{instance.id}",
+        *(f"group:{group_id}" for group_id in group_ids),
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    page_cache.bump(f"group:{instance.id}")
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_group(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._old_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list("group_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, post_count=1)
+        timeline.fan_out(instance)
+    page_cache.bump(*post_tags(instance))
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, create=False, post_count=-1)
+    page_cache.bump(*post_tags(instance))
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_comments(instance.post_id, 1)
+    page_cache.bump(f"post:{instance.post_id}")
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+    page_cache.bump(f"post:{instance.post_id}")
+
+
+# Подписки через ORM (админка, каскадное удаление); представления
+# подписываются запросами posts/follows.py, без сигналов.
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        follows.followed(instance.user_id, [instance.author_id])
+    else:
+        page_cache.bump(
+            f"author:{instance.author_id}", f"author:{instance.user_id}"
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    follows.unfollowed(instance.user_id, [instance.author_id])
@@ -0,0 +1,60 @@
+import zlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from .. import timing
+from ..thumbnails import PENDING_MARKER
+
+register = template.Library()
+
+CARD_TEMPLATE = "includes/post_card.html"
+
+
+def card_key(post, author, is_owner):
+    """Ключ карточки: id поста и версия его отображаемых данных.
+
+    Версия - crc32 от всего, что выводит карточка, поэтому правка поста
+    или смена username автора сами дают новый ключ, а старая запись
+    просто истекает по таймауту.
+    """
+    data = "\x00".join(
+        (
+            post.preview_html,
+            str(post.image),
+            post.pub_date.isoformat(),
+            author.username,
+        )
+    )
+    version = zlib.crc32(data.encode())
+    return f"post_card:{post.id}:{version:x}:{int(is_owner)}"
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Вывести карточки постов, забрав готовые из кеша одним get_many."""
+    user = context.get("user")
+    keys = []
+    for post in posts:
+        author = context.get("author") or post.author
+        is_owner = user is not None and user.username == author.username
+        keys.append(card_key(post, author, is_owner))
+    with timing.measure("cache"):
+        cached = cache.get_many(keys)
+    timing.cache_lookup(keys, cached)
+    card = context.template.engine.get_template(CARD_TEMPLATE)
+    rendered, missing = [], {}
+    for key, post in zip(keys, posts):
+        if key not in cached:
+            with context.push(post=post):
+                cached[key] = card.render(context)
+            # Карточку с заглушкой вместо миниатюры не кешируем.
+            if PENDING_MARKER not in cached[key]:
+                missing[key] = cached[key]
+        rendered.append(cached[key])
+    if missing:
+        with timing.measure("cache"):
+            cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return mark_safe("".join(rendered))
@@ -0,0 +1,31 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(image, geometry, **options):
+    """Готовая миниатюра или None; отсутствующую ставит в очередь.
+
+    ``{% ready_thumbnail post.image "960x339" crop="center" as im %}``
+    """
+    if not image:
+        return None
+    found = thumbnails.lookup(image, geometry, **options)
+    if found is None:
+        thumbnails.schedule(image.instance)
+    return found
+
+
+@register.simple_tag
+def card_picture(image):
+    """Варианты картинки карточки для ``<picture>`` или None.
+
+    Если каких-то вариантов ещё нет, пост ставится в очередь.
+    """
+    picture = thumbnails.card_picture(image)
+    if image and (picture is None or not picture.complete):
+        thumbnails.schedule(image.instance)
+    return picture
@@ -0,0 +1,139 @@
+import json
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="author", first_name="Лев", last_name="Толстой"
+        )
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(title="Группа", slug="group")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                text=f"пост {i}",
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+            )
+            for i in range(5)
+        ]
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.posts[0], author=cls.reader, text=f"ответ {i}"
+            )
+
+    def setUp(self):
+        self.client = Client()
+
+    def get(self, url, status=200, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response["Content-Type"], "application/json")
+        if response.streaming:
+            return json.loads(b"".join(response.streaming_content))
+        return response.json()
+
+    def test_posts_are_listed_by_cursor(self):
+        url = reverse("api_posts")
+        first = self.get(url, limit=3)
+        self.assertEqual(
+            [post["text"] for post in first["results"]],
+            ["пост 4", "пост 3", "пост 2"],
+        )
+        self.assertIsNone(first["previous_cursor"])
+        self.assertEqual(
+            first["results"][0]["author"],
+            {"username": "author", "name": "Лев Толстой"},
+        )
+        self.assertIsNone(first["results"][0]["group"])
+        self.assertEqual(
+            first["results"][1]["group"], {"slug": "group", "title": "Группа"}
+        )
+        second = self.get(url, limit=3, after=first["next_cursor"])
+        self.assertEqual(
+            [post["id"] for post in second["results"]],
+            [self.posts[1].id, self.posts[0].id],
+        )
+        self.assertIsNone(second["next_cursor"])
+        back = self.get(url, limit=3, before=second["previous_cursor"])
+        self.assertEqual(back["results"], first["results"])
+
+    def test_sparse_fields_shrink_the_query(self):
+        with CaptureQueriesContext(connection) as captured:
+            data = self.get(reverse("api_posts"), fields="id,text")
+        self.assertEqual(set(data["results"][0]), {"id", "text"})
+        (sql,) = [query["sql"] for query in captured.captured_queries]
+        self.assertNotIn("JOIN", sql)
+        self.assertNotIn('"image"', sql)
+        with CaptureQueriesContext(connection) as captured:
+            data = self.get(reverse("api_posts"), fields="author")
+        self.assertEqual(list(data["results"][0]), ["author"])
+        (sql,) = [query["sql"] for query in captured.captured_queries]
+        self.assertIn('JOIN "auth_user"', sql)
+        self.assertNotIn('"email"', sql)
+        self.assertNotIn('"posts_group"', sql)
+
+    def test_feeds(self):
+        group_posts = self.get(
+            reverse("api_group_posts", args=["group"]), fields="id"
+        )
+        self.assertEqual(
+            [post["id"] for post in group_posts["results"]],
+            [self.posts[3].id, self.posts[1].id],
+        )
+        profile_posts = self.get(
+            reverse("api_profile_posts", args=["author"]), fields="id"
+        )
+        self.assertEqual(len(profile_posts["results"]), 5)
+        comments = self.get(
+            reverse("api_post_comments", args=[self.posts[0].id]), limit=2
+        )
+        self.assertEqual(
+            [comment["text"] for comment in comments["results"]],
+            ["ответ 0", "ответ 1"],
+        )
+        self.assertEqual(comments["results"][0]["post"], self.posts[0].id)
+        groups = self.get(reverse("api_groups"))
+        self.assertEqual(groups["results"][0]["slug"], "group")
+        post = self.get(
+            reverse("api_post", args=[self.posts[0].id]),
+            fields="text,comment_count",
+        )
+        self.assertEqual(post, {"text": "пост 0", "comment_count": 3})
+
+    def test_follow_feed(self):
+        url = reverse("api_follow")
+        self.assertEqual(
+            self.get(url, status=401), {"error": "Нужна авторизация"}
+        )
+        self.client.force_login(self.reader)
+        data = self.get(url, fields="text,author", limit=2)
+        self.assertEqual(
+            [post["text"] for post in data["results"]], ["пост 4", "пост 3"]
+        )
+        self.assertEqual(data["results"][0]["author"]["username"], "author")
+        rest = self.get(url, fields="text", after=data["next_cursor"])
+        self.assertEqual(len(rest["results"]), 3)
+
+    def test_errors(self):
+        url = reverse("api_posts")
+        self.assertIn("nope", self.get(url, 400, fields="id,nope")["error"])
+        for limit in ("0", "101", "x"):
+            with self.subTest(limit=limit):
+                self.get(url, 400, limit=limit)
+        for missing in (
+            reverse("api_group_posts", args=["missing"]),
+            reverse("api_profile_posts", args=["missing"]),
+            reverse("api_post", args=[self.posts[-1].id + 1]),
+        ):
+            with self.subTest(url=missing):
+                self.get(missing, 404)
+        self.assertEqual(self.client.post(url).status_code, 405)
@@ -0,0 +1,161 @@
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.core.management import call_command
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from .. import bulk
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class BulkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(title="Группа", slug="group")
+        cls.posts = [
+            Post.objects.create(
+                text=f"Пост {i}", author=cls.author, group=cls.group
+            )
+            for i in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text="Коммент"
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, fmt):
+        out = io.StringIO()
+        call_command(
+            "export_data",
+            format=fmt,
+            batch_size=2,
+            stdout=out,
+            stderr=io.StringIO(),
+        )
+        return out.getvalue()
+
+    def load(self, data, **options):
+        out = io.StringIO()
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as file:
+            file.write(data)
+            file.flush()
+            call_command("import_data", file.name, stdout=out, **options)
+        return out.getvalue()
+
+    def wipe(self):
+        for label in reversed(bulk.MODELS):
+            bulk.apps.get_model(label).objects.all().delete()
+
+    def test_read_objects_is_incremental(self):
+        data = json.dumps([{"a": "[{,}]"}, {"b": [1, 2]}, {"c": {}}])
+        ndjson = '{"a": 1}\n{"b": 2}\n'
+        with mock.patch.object(bulk, "READ_SIZE", 3):
+            self.assertEqual(
+                list(bulk.read_objects(io.StringIO(data))),
+                [{"a": "[{,}]"}, {"b": [1, 2]}, {"c": {}}],
+            )
+            self.assertEqual(
+                list(bulk.read_objects(io.StringIO(ndjson))),
+                [{"a": 1}, {"b": 2}],
+            )
+        with self.assertRaises(ValueError):
+            list(bulk.read_objects(io.StringIO('[{"a": 1}, {"b"')))
+
+    def test_export_is_ordered_by_dependencies(self):
+        labels = [
+            json.loads(line)["model"]
+            for line in self.export("ndjson").splitlines()
+        ]
+        self.assertEqual(labels, sorted(labels, key=bulk.MODELS.index))
+        self.assertEqual(labels.count("posts.post"), 5)
+        self.assertEqual(len(json.loads(self.export("json"))), len(labels))
+
+    def test_round_trip_rebuilds_derived_data(self):
+        # Даты из файла, а не время загрузки (auto_now_add/auto_now).
+        Post.objects.filter(id=self.posts[0].id).update(
+            pub_date=datetime(2020, 1, 2, tzinfo=timezone.utc),
+            updated=datetime(2020, 1, 3, tzinfo=timezone.utc),
+        )
+        for fmt in ("ndjson", "json"):
+            with self.subTest(fmt=fmt):
+                data = self.export(fmt)
+                self.wipe()
+                with mock.patch.object(bulk, "READ_SIZE", 50):
+                    out = self.load(data, batch_size=2)
+                self.assertIn("Обработано 10 строк", out)
+                self.assertEqual(Post.objects.count(), 5)
+                author = User.objects.get(username="author")
+                self.assertEqual(author.stats.post_count, 5)
+                self.assertEqual(author.stats.follower_count, 1)
+                post = Post.objects.get(id=self.posts[0].id)
+                self.assertEqual(post.comment_count, 1)
+                self.assertEqual(post.pub_date.year, 2020)
+                self.assertEqual(post.updated.day, 3)
+                self.assertEqual(
+                    TimelineEntry.objects.filter(user=self.reader).count(), 5
+                )
+
+    def test_dump_of_old_version(self):
+        # Даты постов из dump.json (1854 год) не заменяются временем
+        # загрузки; поля updated в нём нет - его добавила миграция 0016.
+        self.wipe()
+        with open(os.path.join(settings.BASE_DIR, "dump.json")) as file:
+            out = self.load(file.read())
+        self.assertIn("Пропущены модели: admin.logentry", out)
+        posts = Post.objects.order_by("pub_date")
+        self.assertEqual(posts.count(), 36)
+        self.assertEqual(posts[0].pub_date.year, 1854)
+        for post in posts:
+            self.assertEqual(post.updated, post.pub_date)
+            self.assertTrue(post.preview_html)
+
+    def test_missing_updated_is_taken_from_creation_date(self):
+        created = datetime(1900, 5, 6, tzinfo=timezone.utc)
+        self.wipe()
+        rows = [
+            {
+                "model": "auth.user",
+                "pk": self.author.id,
+                "fields": {"username": "author", "password": ""},
+            },
+            {
+                "model": "posts.post",
+                "pk": 1,
+                "fields": {
+                    "text": "Пост",
+                    "author": self.author.id,
+                    "pub_date": created.isoformat(),
+                },
+            },
+            {
+                "model": "posts.comment",
+                "pk": 1,
+                "fields": {
+                    "post": 1,
+                    "author": self.author.id,
+                    "text": "Коммент",
+                    "created": created.isoformat(),
+                },
+            },
+        ]
+        self.load(json.dumps(rows))
+        post = Post.objects.get()
+        self.assertEqual((post.pub_date, post.updated), (created, created))
+        comment = Comment.objects.get()
+        self.assertEqual(comment.created, created)
+        self.assertEqual(comment.updated, created)
+
+    def test_conflicts(self):
+        data = self.export("ndjson")
+        with self.assertRaises(CommandError):
+            self.load(data)
+        self.load(data, ignore_conflicts=True)
+        self.assertEqual(Post.objects.count(), 5)
@@ -0,0 +1,167 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import page_cache
+from ..models import Comment, Follow, Group, Post, User
+from ..templatetags.post_cards import card_key
+from yatube.cache import TwoTierCache
+
+
+class PostCardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+        self.post = Post.objects.create(text="исходный", author=self.author)
+        self.client = Client()
+        self.url = reverse("profile", args=[self.author.username])
+
+    def test_card_is_served_from_cache(self):
+        self.client.get(self.url)
+        key = card_key(self.post, self.author, is_owner=False)
+        self.assertIn("исходный", cache.get(key))
+        cache.set(key, "<p>из кеша</p>")
+        page_cache.bump(f"author:{self.author.id}")
+        self.assertContains(self.client.get(self.url), "из кеша")
+
+    def test_edit_and_rename_change_version(self):
+        self.client.get(self.url)
+        self.post.text = "исправленный"
+        self.post.save()
+        self.assertContains(self.client.get(self.url), "исправленный")
+        self.author.username = "renamed"
+        self.author.save()
+        response = self.client.get(reverse("profile", args=["renamed"]))
+        self.assertContains(response, "@renamed")
+
+    def test_owner_sees_edit_link(self):
+        self.client.get(self.url)
+        self.client.force_login(self.author)
+        self.assertContains(self.client.get(self.url), "Редактировать")
+
+
+class TaggedPageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+        self.group = Group.objects.create(title="группа", slug="group")
+        self.post = Post.objects.create(
+            text="первый", author=self.author, group=self.group
+        )
+        self.urls = [
+            reverse("index"),
+            reverse("group", args=[self.group.slug]),
+            reverse("profile", args=[self.author.username]),
+        ]
+
+    def test_cached_page_skips_database(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                with self.assertNumQueries(0):
+                    self.assertContains(self.client.get(url), "первый")
+
+    def test_new_post_invalidates_pages(self):
+        for url in self.urls:
+            self.client.get(url)
+        Post.objects.create(
+            text="второй", author=self.author, group=self.group
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), "второй")
+
+    def test_evicted_tag_invalidates_pages(self):
+        url = reverse("index")
+        # Страница рендерится, когда версии тега в кеше нет.
+        cache.delete("tag:index")
+        self.client.get(url)
+        Post.objects.filter(id=self.post.id).update(
+            preview_html="исправленный"
+        )
+        page_cache.bump("index")
+        # Кеш вытесняет сдвинутую версию.
+        cache.delete("tag:index")
+        self.assertContains(self.client.get(url), "исправленный")
+
+    def test_moving_post_invalidates_old_group(self):
+        url = reverse("group", args=[self.group.slug])
+        self.client.get(url)
+        self.post.group = Group.objects.create(title="другая", slug="other")
+        self.post.save()
+        self.assertNotContains(self.client.get(url), "первый")
+
+    def test_group_edit_invalidates_group_page(self):
+        url = reverse("group", args=[self.group.slug])
+        self.client.get(url)
+        self.group.description = "новое описание"
+        self.group.save()
+        self.assertContains(self.client.get(url), "новое описание")
+
+    def test_author_rename_invalidates_group_page(self):
+        url = reverse("group", args=[self.group.slug])
+        self.client.get(url)
+        self.author.first_name = "Лев"
+        self.author.last_name = "Толстой"
+        self.author.save()
+        self.assertContains(self.client.get(url), "Лев Толстой")
+
+    def test_comment_and_follow_invalidate_pages(self):
+        reader = User.objects.create_user(username="reader")
+        post_url = reverse("post", args=[self.post.id])
+        profile_url = reverse("profile", args=[self.author.username])
+        self.client.get(post_url)
+        self.client.get(profile_url)
+        Comment.objects.create(post=self.post, author=reader, text="коммент")
+        Follow.objects.create(user=reader, author=self.author)
+        self.assertContains(self.client.get(post_url), "коммент")
+        self.assertContains(self.client.get(profile_url), "Подписчиков: 1")
+
+
+class TwoTierCacheTest(TestCase):
+    """Два экземпляра на одном файле ведут себя как два воркера."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.location = os.path.join(self.dir, "cache.sqlite3")
+        self.worker1 = TwoTierCache(self.location, {})
+        self.worker2 = TwoTierCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_shared_between_workers(self):
+        self.worker1.set("key", {"a": 1})
+        self.assertEqual(self.worker2.get("key"), {"a": 1})
+        self.worker1.set("key", {"a": 2})
+        self.assertEqual(self.worker2.get("key"), {"a": 2})
+        self.worker1.delete("key")
+        self.assertIsNone(self.worker2.get("key"))
+
+    def test_l1_serves_without_l2(self):
+        self.worker1.set("key", "value")
+        self.assertEqual(self.worker2.get("key"), "value")
+        # Строку удаляем в обход кеша: журнал не меняется, L1 остаётся.
+        with sqlite3.connect(self.location) as conn:
+            conn.execute("DELETE FROM cache")
+        self.assertEqual(self.worker2.get("key"), "value")
+
+    def test_clear_invalidates_other_l1(self):
+        self.worker1.set_many({"a": 1, "b": 2})
+        self.assertEqual(self.worker2.get_many(["a", "b"]), {"a": 1, "b": 2})
+        self.worker1.clear()
+        self.assertEqual(self.worker2.get_many(["a", "b"]), {})
+
+    def test_timeouts_add_and_incr(self):
+        self.worker1.set("gone", 1, timeout=0)
+        self.assertIsNone(self.worker2.get("gone"))
+        self.assertTrue(self.worker1.add("counter", 1))
+        self.assertFalse(self.worker2.add("counter", 5))
+        self.assertEqual(self.worker2.incr("counter"), 2)
+        self.assertEqual(self.worker1.get("counter"), 2)
+        self.assertTrue(self.worker2.has_key("counter"))
@@ -0,0 +1,20 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import checks
+
+
+class SqliteVersionCheckTest(SimpleTestCase):
+    def test_current_version_passes(self):
+        self.assertEqual(checks.check_sqlite_version(None), [])
+
+    def test_old_sqlite_is_an_error(self):
+        with mock.patch.multiple(
+            checks.sqlite3,
+            sqlite_version_info=(3, 31, 1),
+            sqlite_version="3.31.1",
+        ):
+            (error,) = checks.check_sqlite_version(None)
+        self.assertEqual(error.id, "posts.E001")
+        self.assertIn("3.31.1", error.msg)
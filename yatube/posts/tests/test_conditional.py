@@ -0,0 +1,105 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(title="Группа", slug="group")
+        cls.post = Post.objects.create(
+            text="Пост", author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = [
+            reverse("post", args=[self.post.id]),
+            reverse("profile", args=[self.author.username]),
+            reverse("group", args=[self.group.slug]),
+        ]
+
+    def revalidate(self, url, client=None):
+        client = client or self.client
+        first = client.get(url)
+        self.assertEqual(first.status_code, 200)
+        return client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    def test_unchanged_page_is_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertIn("Last-Modified", first)
+                # Ответ и из кеша страниц, и после его очистки.
+                for _ in range(2):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=first["ETag"]
+                    )
+                    self.assertEqual(response.status_code, 304)
+                    cache.clear()
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_give_new_etag(self):
+        url = reverse("post", args=[self.post.id])
+        changes = [
+            self.post.save,
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text="Комментарий"
+            ),
+            lambda: Follow.objects.create(
+                user=self.reader, author=self.author
+            ),
+        ]
+        seen = {self.client.get(url)["ETag"]}
+        for change in changes:
+            change()
+            cache.clear()
+            etag = self.client.get(url)["ETag"]
+            self.assertNotIn(etag, seen)
+            seen.add(etag)
+        for url in self.urls[1:]:
+            with self.subTest(url=url):
+                etag = self.client.get(url)["ETag"]
+                Post.objects.create(
+                    text="Ещё пост", author=self.author, group=self.group
+                )
+                cache.clear()
+                self.assertNotEqual(self.client.get(url)["ETag"], etag)
+
+    def test_author_rename_gives_new_group_etag(self):
+        url = reverse("group", args=[self.group.slug])
+        first = self.client.get(url)
+        self.author.first_name = "Лев"
+        self.author.last_name = "Толстой"
+        self.author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Лев Толстой")
+
+    def test_etag_depends_on_viewer(self):
+        url = self.urls[1]
+        anonymous = self.client.get(url)["ETag"]
+        reader = Client()
+        reader.force_login(self.reader)
+        response = reader.get(url, HTTP_IF_NONE_MATCH=anonymous)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)
+        self.assertEqual(self.revalidate(url, reader).status_code, 304)
+        reader.get(reverse("profile_follow", args=[self.author.username]))
+        response = reader.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_page_is_404(self):
+        response = self.client.get(
+            reverse("post", args=[self.post.id + 100]),
+            HTTP_IF_NONE_MATCH='"x"',
+        )
+        self.assertEqual(response.status_code, 404)
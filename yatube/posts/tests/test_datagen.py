@@ -0,0 +1,92 @@
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
+from django.test import TestCase
+
+from .. import datagen, search
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+UNTIL = datetime(2021, 9, 1, tzinfo=timezone.utc)
+SIZES = {"users": 40, "groups": 3, "posts": 300, "comments": 500}
+
+
+class GeneratorTest(TestCase):
+    def generate(self, seed=0):
+        return datagen.Generator(
+            UNTIL, seed=seed, follows=5, batch_size=64, **SIZES
+        ).generate()
+
+    def snapshot(self):
+        fields = {
+            Post: ("author_id", "group_id", "text", "pub_date"),
+            Comment: ("post_id", "author_id", "created"),
+            Follow: ("user_id", "author_id"),
+        }
+        return [
+            list(model.objects.order_by("id").values_list(*names))
+            for model, names in fields.items()
+        ]
+
+    def wipe(self):
+        for model in (Comment, Follow, Post, Group, User):
+            model.objects.all().delete()
+
+    def test_counts_and_derived_data(self):
+        created = self.generate()
+        self.assertEqual(created["auth.user"], 40)
+        self.assertEqual(created["posts.post"], 300)
+        self.assertEqual(created["posts.comment"], 500)
+        self.assertEqual(Follow.objects.filter(user=1, author=1).count(), 0)
+        # Даты из генератора, а не время вставки.
+        self.assertLessEqual(
+            Post.objects.latest("pub_date").pub_date, UNTIL
+        )
+        for user in User.objects.select_related("stats")[:10]:
+            self.assertEqual(user.stats.post_count, user.posts.count())
+            self.assertEqual(
+                user.stats.follower_count, user.following.count()
+            )
+        post = Post.objects.annotate(n=Count("comments")).first()
+        self.assertEqual(post.comment_count, post.n)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id
+            ).count(),
+            Post.objects.filter(author_id=follow.author_id).count(),
+        )
+        word = Post.objects.first().text.split()[1]
+        self.assertTrue(
+            search.filter_matching(Post.objects.all(), word).exists()
+        )
+        # Новые объекты получают id после сгенерированных.
+        self.assertEqual(
+            User.objects.create_user(username="new").id, SIZES["users"] + 1
+        )
+
+    def test_activity_follows_power_law(self):
+        self.generate()
+        posts = sorted(
+            Counter(Post.objects.values_list("author_id", flat=True))
+            .values(),
+            reverse=True,
+        )
+        self.assertGreater(posts[0], 5 * posts[len(posts) // 2])
+
+    def test_same_seed_gives_same_data(self):
+        self.generate(seed=7)
+        first = self.snapshot()
+        self.wipe()
+        self.generate(seed=7)
+        self.assertEqual(self.snapshot(), first)
+        self.wipe()
+        self.generate(seed=8)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_command_refuses_non_empty_database(self):
+        User.objects.create_user(username="existing")
+        with self.assertRaises(CommandError):
+            call_command("generate_data", users=2, posts=2, comments=2)
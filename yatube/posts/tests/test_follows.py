@@ -0,0 +1,109 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import follows
+from ..models import Follow, Post, TimelineEntry, User, UserStats
+
+
+class FollowsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username="reader")
+        cls.authors = [
+            User.objects.create_user(username=f"author{i}") for i in range(3)
+        ]
+        for author in cls.authors:
+            Post.objects.create(text="пост", author=author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_follow_and_unfollow_are_idempotent(self):
+        author = self.authors[0]
+        url = reverse("profile_follow", args=[author.username])
+        for _ in range(2):
+            self.assertRedirects(
+                self.client.get(url),
+                reverse("profile", args=[author.username]),
+            )
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 1)
+        self.assertEqual(self.stats(author).follower_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(TimelineEntry.objects.count(), 1)
+        url = reverse("profile_unfollow", args=[author.username])
+        for _ in range(2):
+            self.client.get(url)
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(self.stats(author).follower_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_self_and_missing_authors(self):
+        self.client.get(reverse("profile_follow", args=["reader"]))
+        self.assertFalse(Follow.objects.exists())
+        for name in ("profile_follow", "profile_unfollow"):
+            response = self.client.get(reverse(name, args=["nobody"]))
+            self.assertEqual(response.status_code, 404)
+
+    def test_bulk_endpoint(self):
+        Follow.objects.create(user=self.reader, author=self.authors[2])
+        response = self.client.post(
+            reverse("follow_bulk"),
+            {
+                "follow": ["author0", "author1", "reader", "nobody"],
+                "unfollow": ["author2"],
+            },
+        )
+        self.assertEqual(response.json(), {"followed": 2, "unfollowed": 1})
+        self.assertEqual(
+            set(
+                Follow.objects.filter(user=self.reader).values_list(
+                    "author__username", flat=True
+                )
+            ),
+            {"author0", "author1"},
+        )
+        self.assertEqual(self.stats(self.reader).following_count, 2)
+        self.assertEqual(self.stats(self.authors[2]).follower_count, 0)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+
+    def test_bulk_endpoint_limits(self):
+        url = reverse("follow_bulk")
+        self.assertEqual(self.client.get(url).status_code, 405)
+        names = [f"user{i}" for i in range(follows.BATCH_SIZE + 1)]
+        response = self.client.post(url, {"follow": names})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        out = StringIO()
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".txt", delete=False
+        ) as file:
+            file.write("# авторы\nauthor1\n\nauthor2\n")
+        self.addCleanup(os.remove, file.name)
+        call_command(
+            "follow", "reader", "author0", "nobody", file=file.name,
+            stdout=out, stderr=StringIO(),
+        )
+        self.assertIn("3", out.getvalue())
+        newcomer = User.objects.create_user(username="newcomer")
+        call_command(
+            "follow", "newcomer", copy_from="reader", stdout=StringIO()
+        )
+        self.assertEqual(self.stats(newcomer).following_count, 3)
+        call_command(
+            "follow", "reader", "author0", unfollow=True, stdout=StringIO()
+        )
+        self.assertEqual(self.stats(self.reader).following_count, 2)
+        self.assertEqual(self.stats(self.authors[0]).follower_count, 1)
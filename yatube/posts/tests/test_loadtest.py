@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from ..management.commands import loadtest
+from ..management.commands.loadtest import compare, percentile, summarize
+
+
+class LoadtestReportTest(SimpleTestCase):
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_summarize(self):
+        samples = [(0.01, 3, 200), (0.02, 5, 302), (0.1, 4, 500)]
+        row = summarize(samples, wall=2)
+        self.assertEqual(row["requests"], 3)
+        self.assertEqual(row["rps"], 1.5)
+        self.assertEqual(row["errors"], 1)
+        self.assertEqual(row["queries"], 4)
+        self.assertEqual(row["p50_ms"], 20)
+        self.assertEqual(row["p99_ms"], 100)
+
+    def test_compare_with_baseline(self):
+        base = {"p95_ms": 10.0, "queries": 4.0, "errors": 0}
+        baseline = {"routes": {"index": base, "post": base}}
+        report = {
+            "routes": {
+                "index": {"p95_ms": 12.0, "queries": 4.0, "errors": 0},
+                "post": {"p95_ms": 9.0, "queries": 6.0, "errors": 1},
+                "search": {"p95_ms": 99.0, "queries": 9.0, "errors": 0},
+            }
+        }
+        self.assertEqual(
+            compare(report, baseline, tolerance=0.25),
+            ["post: queries 4.0 -> 6.0", "post: errors 0 -> 1"],
+        )
+        self.assertEqual(len(compare(report, baseline, tolerance=0.1)), 3)
+
+
+class LoadtestClientsTest(SimpleTestCase):
+    def test_failed_client_stops_the_others(self):
+        def session(rng, user):
+            if user == "broken":
+                raise ValueError("нет данных")
+
+        users = mock.Mock()
+        users.objects.order_by.return_value = ["broken", "ok", "ok"]
+        options = {"clients": 3, "seed": 0, "rounds": 0}
+        with mock.patch.multiple(loadtest, User=users, Session=session):
+            with mock.patch.object(loadtest.connection, "close"):
+                with self.assertRaisesMessage(CommandError, "нет данных"):
+                    loadtest.Command().run(("index",), options)
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .. import metrics
+from ..models import Post, User
+
+
+class MetricsDirMixin:
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(METRICS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+class MetricsEndpointTest(MetricsDirMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.staff = User.objects.create_user(username="staff", is_staff=True)
+        cls.post = Post.objects.create(text="Пост", author=cls.author)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = Client()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def scrape(self):
+        response = self.staff_client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_requests_are_counted_per_route(self):
+        for _ in range(2):
+            self.client.get(reverse("index"))
+        self.client.get(reverse("post", args=[self.post.id + 1]))
+        text = self.scrape()
+        for line in (
+            "# TYPE yatube_requests_total counter",
+            'yatube_requests_total{view="index",method="GET",status="200"} 2',
+            'yatube_requests_total{view="post",method="GET",status="404"} 1',
+            "# TYPE yatube_request_duration_seconds histogram",
+            'yatube_request_duration_seconds_bucket{view="index",le="+Inf"} 2',
+            'yatube_request_duration_seconds_count{view="index"} 2',
+            'yatube_cache_requests_total{view="index",result="hit"} 2',
+        ):
+            self.assertIn(line + "\n", text)
+        prefix = 'yatube_request_duration_seconds_bucket{view="index"'
+        buckets = [
+            line for line in text.splitlines() if line.startswith(prefix)
+        ]
+        self.assertEqual(len(buckets), len(metrics.BUCKETS) + 1)
+        self.assertTrue(buckets[-1].endswith('le="+Inf"} 2'))
+        self.assertRegex(
+            text, r'yatube_request_queries_total\{view="post"\} \d'
+        )
+
+    def test_endpoint_is_protected(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with override_settings(METRICS_TOKEN="secret"):
+            for header, status in (
+                ("Bearer secret", 200),
+                ("Bearer wrong", 403),
+                ("secret", 403),
+            ):
+                with self.subTest(header=header):
+                    response = self.client.get(url, HTTP_AUTHORIZATION=header)
+                    self.assertEqual(response.status_code, status)
+
+
+class StoreTest(MetricsDirMixin, SimpleTestCase):
+    def test_processes_are_summed_and_archived(self):
+        metrics._current_store().add("jobs_total", 2)
+        pid = os.fork()
+        if pid == 0:
+            metrics._current_store().add("jobs_total", 3)
+            metrics._current_store().add("child_total")
+            os._exit(0)
+        os.waitpid(pid, 0)
+        expected = {"jobs_total": 5, "child_total": 1}
+        self.assertEqual(metrics.collect(self.directory), expected)
+        self.assertIn(f"{pid}.metrics", os.listdir(self.directory))
+        # Новый процесс сливает файл завершившегося в архив.
+        metrics._owner = None
+        metrics._current_store()
+        self.assertNotIn(f"{pid}.metrics", os.listdir(self.directory))
+        self.assertIn(metrics.ARCHIVE, os.listdir(self.directory))
+        self.assertEqual(metrics.collect(self.directory), expected)
+
+    def test_store_grows_and_reopens(self):
+        path = os.path.join(self.directory, "test.metrics")
+        store = metrics.Store(path)
+        keys = [metrics.sample("x_total", n=n) for n in range(5000)]
+        for key in keys:
+            store.add(key, 1.5)
+        store.add(keys[0])
+        store.close()
+        self.assertGreater(os.path.getsize(path), metrics.INITIAL_SIZE)
+        reopened = metrics.Store(path)
+        reopened.add(keys[-1])
+        reopened.close()
+        values = metrics.read(path)
+        self.assertEqual(len(values), 5000)
+        self.assertEqual(values[keys[0]], 2.5)
+        self.assertEqual(values[keys[-1]], 2.5)
+        self.assertEqual(values[keys[1]], 1.5)
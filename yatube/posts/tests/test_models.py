@@ -1,5 +1,15 @@
-from django.test import TestCase
-from ..models import Group, Post, User
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import prerender
+from ..bulk import insert_raw
+from ..models import Comment, Follow, Group, Post, User, UserStats
 
 
 class PostsModelTest(TestCase):
@@ -19,3 +29,78 @@ class PostsModelTest(TestCase):
         for key, value in expect.items():
             with self.subTest(value=value):
                 self.assertEqual(key, value)
+
+
+class PrerenderTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author")
+
+    def test_html_and_preview_are_stored_on_save(self):
+        post = Post.objects.create(
+            text="<b>жирный</b>\nстрока", author=self.author
+        )
+        self.assertEqual(post.text_html, "&lt;b&gt;жирный&lt;/b&gt;<br>строка")
+        self.assertEqual(post.preview_html, post.text_html)
+        post.text = "слово " * 100
+        post.save(update_fields=["text"])
+        post.refresh_from_db()
+        self.assertEqual(len(post.preview), prerender.PREVIEW_LENGTH)
+        self.assertTrue(post.preview.endswith("…"))
+        self.assertEqual(post.text_html, post.text)
+
+    def test_raw_insert_prerenders(self):
+        now = timezone.now()
+        insert_raw(
+            Post,
+            [Post(text="a\nb", author=self.author, pub_date=now, updated=now)],
+        )
+        self.assertEqual(Post.objects.get().preview_html, "a<br>b")
+
+    def test_feeds_do_not_read_full_text(self):
+        post = Post.objects.create(text="длинный " * 100, author=self.author)
+        client = Client()
+        for url in (reverse("index"), reverse("profile", args=["author"])):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as captured:
+                    response = client.get(url)
+                self.assertContains(response, post.preview_html)
+                self.assertNotContains(response, post.text_html)
+                for query in captured.captured_queries:
+                    self.assertNotIn('"posts_post"."text"', query["sql"])
+        response = client.get(reverse("post", args=[post.id]))
+        self.assertContains(response, post.text_html)
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author")
+        self.reader = User.objects.create_user(username="reader")
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        post = Post.objects.create(text="текст", author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text="к")
+        Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        Follow.objects.all().delete()
+        post.delete()
+        self.assertEqual(self.stats(self.author).post_count, 0)
+        self.assertEqual(self.stats(self.author).follower_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_rebuild_counters(self):
+        post = Post.objects.create(text="текст", author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text="к")
+        UserStats.objects.all().delete()
+        Post.objects.update(comment_count=0)
+        call_command("rebuild_counters", stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        self.assertEqual(self.stats(self.reader).post_count, 0)
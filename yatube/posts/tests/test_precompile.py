@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.template import Context, Engine
+from django.test import SimpleTestCase, override_settings
+
+from .. import precompile
+
+
+def templates_settings(directory, cached=True):
+    # Без debug Django сам оборачивает загрузчики в cached.Loader.
+    return [
+        {
+            "BACKEND": "posts.timing.DjangoTemplates",
+            "DIRS": [directory],
+            "APP_DIRS": True,
+            "OPTIONS": {"debug": not cached},
+        }
+    ]
+
+
+class PrecompileTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        os.makedirs(os.path.join(self.directory, "includes"))
+        self.write("page.html", '{% include "includes/part.html" %}')
+        self.write("includes/part.html", "{{ value }}")
+
+    def write(self, name, source):
+        with open(os.path.join(self.directory, name), "w") as file:
+            file.write(source)
+
+    def test_project_templates_compile(self):
+        out = StringIO()
+        call_command("compile_templates", stdout=out)
+        names = precompile.template_names(Engine.get_default())
+        for name in (
+            "base.html",
+            "includes/post_card.html",
+            "admin/base.html",
+        ):
+            with self.subTest(name=name):
+                self.assertIn(name, names)
+        self.assertIn(str(len(names)), out.getvalue())
+
+    def test_cached_loader_keeps_compiled_templates(self):
+        with override_settings(TEMPLATES=templates_settings(self.directory)):
+            engine = Engine.get_default()
+            precompile.compile_all(engine)
+            (loader,) = engine.template_loaders
+            self.assertIn("page.html", loader.get_template_cache)
+            self.assertIn("includes/part.html", loader.get_template_cache)
+            # Файл больше не читается: шаблон уже в кеше.
+            self.write("includes/part.html", "изменён")
+            template = engine.get_template("page.html")
+            self.assertNotIn("изменён", template.render(Context()))
+
+    def test_syntax_errors_are_collected(self):
+        self.write("broken.html", "{% if %}")
+        self.write("includes/broken.html", "{% endfor %}")
+        with override_settings(
+            TEMPLATES=templates_settings(self.directory, cached=False)
+        ):
+            with self.assertRaises(precompile.TemplateErrors) as caught:
+                precompile.compile_all()
+            self.assertEqual(
+                set(caught.exception.errors),
+                {"broken.html", "includes/broken.html"},
+            )
+            with self.assertRaisesMessage(CommandError, "broken.html"):
+                call_command("compile_templates", stdout=StringIO())
@@ -0,0 +1,114 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from .. import views
+from ..budget import QueryBudgetExceeded, count_queries, get_budget
+from ..models import Comment, Follow, Group, Post, User
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов каждого представления укладывается в его бюджет
+    и не растёт с числом постов и комментариев на странице."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(title="group", slug="group")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                text=f"пост {i}", author=cls.author, group=cls.group
+            )
+            for i in range(15)
+        ]
+        for i in range(15):
+            Comment.objects.create(
+                post=cls.posts[-1],
+                author=User.objects.create_user(username=f"commenter{i}"),
+                text=f"комментарий {i}",
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        cache.clear()
+
+    def assert_within_budget(self, client, method, url, data=None):
+        budget = get_budget(resolve(url.split("?")[0]).func)
+        self.assertIsNotNone(budget, f"{url}: не объявлен @query_budget")
+        with count_queries() as queries:
+            response = getattr(client, method)(url, data)
+        self.assertLess(response.status_code, 400)
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            f"{url}: {len(queries)} запросов\n" + "\n".join(queries.queries),
+        )
+
+    def test_read_views(self):
+        post = self.posts[-1]
+        urls = [
+            reverse("index"),
+            reverse("group", args=[self.group.slug]),
+            reverse("profile", args=[self.author.username]),
+            reverse("post", args=[post.id]),
+            reverse("post_comments", args=[post.id]),
+            reverse("follow_index"),
+            reverse("create"),
+            reverse("index") + "?page=2",
+            reverse("follow_index") + "?page=2",
+            reverse("index") + "?fragment=1",
+            reverse("profile", args=[self.author.username]) + "?fragment=1",
+            reverse("follow_index") + "?fragment=1",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assert_within_budget(self.client, "get", url)
+
+    def test_api_views(self):
+        post = self.posts[-1]
+        urls = [
+            reverse("api_posts"),
+            reverse("api_posts") + "?fields=id,author,group",
+            reverse("api_group_posts", args=[self.group.slug]),
+            reverse("api_profile_posts", args=[self.author.username]),
+            reverse("api_follow"),
+            reverse("api_post", args=[post.id]),
+            reverse("api_post_comments", args=[post.id]),
+            reverse("api_groups"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assert_within_budget(self.client, "get", url)
+
+    def test_write_views(self):
+        post = self.posts[0]
+        cases = [
+            (self.client, reverse("add_comment", args=[post.id]),
+             {"text": "ещё"}),
+            (self.author_client, reverse("post_edit", args=[post.id]),
+             {"text": "правка"}),
+            (self.author_client, reverse("create"), {"text": "новый"}),
+            (self.client, reverse("profile_unfollow", args=["author"]), None),
+            (self.client, reverse("profile_follow", args=["author"]), None),
+            (self.client, reverse("follow_bulk"), {"unfollow": "author"}),
+            (self.client, reverse("follow_bulk"), {"follow": "author"}),
+        ]
+        for client, url, data in cases:
+            with self.subTest(url=url):
+                self.assert_within_budget(client, "post", url, data)
+
+    @override_settings(DEBUG=True)
+    def test_middleware_fails_loudly_in_debug(self):
+        budget = views.group_posts.query_budget
+        views.group_posts.query_budget = 1
+        try:
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse("group", args=[self.group.slug]))
+        finally:
+            views.group_posts.query_budget = budget
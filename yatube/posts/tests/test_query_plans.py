@@ -0,0 +1,139 @@
+import json
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from ..pagination import CommentPaginator
+
+# Полный проход по таблице: «SCAN t» без индекса (в SQLite до 3.36 -
+# «SCAN TABLE t»). Проход по индексу в нужном порядке с LIMIT - норма.
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+( AS \w+)?$")
+# Сортировка результата во временном B-дереве. Для GROUP BY она
+# допустима: агрегаты здесь считаются по одной строке.
+TEMP_SORT = re.compile(r"TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY")
+EXPLAINED = ("SELECT", "UPDATE", "DELETE")
+
+
+class QueryPlanTest(TestCase):
+    """Запросы представлений идут по индексам: без полного прохода по
+    таблице и без сортировки во временном B-дереве. Изменение ORM или
+    индексов, которое их ухудшит, сломает этот тест."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(title="Группа", slug="group")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                text=f"Слово {i}", author=cls.author, group=cls.group
+            )
+            for i in range(15)
+        ]
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.posts[-1], author=cls.reader, text=f"Ответ {i}"
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, method, url, data=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400)
+        for query in captured.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith(EXPLAINED):
+                continue
+            plan = self.plan(sql)
+            # Поиск сортирует по релевантности: её индекс не даёт.
+            ranked = any("VIRTUAL TABLE" in step for step in plan)
+            for step in plan:
+                self.assertIsNone(
+                    FULL_SCAN.match(step), f"{url}: {step}\n{sql}"
+                )
+                if not ranked:
+                    self.assertIsNone(
+                        TEMP_SORT.search(step), f"{url}: {step}\n{sql}"
+                    )
+        return response
+
+    def comment_cursor(self, post):
+        comments = post.comments.order_by("created", "id")
+        return CommentPaginator(comments, 1).encode_cursor(comments[0])
+
+    def test_read_views(self):
+        post = self.posts[-1]
+        urls = [
+            reverse("index"),
+            reverse("group", args=[self.group.slug]),
+            reverse("profile", args=[self.author.username]),
+            reverse("post", args=[post.id]),
+            reverse("post_comments", args=[post.id]),
+            reverse("post_comments", args=[post.id])
+            + f"?after={self.comment_cursor(post)}",
+            reverse("follow_index"),
+            reverse("search") + "?q=Слово",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.assert_indexed("get", url)
+                # Следующая страница - выборка от курсора.
+                page = response.context.get("page_obj")
+                if page is not None and page.next_cursor:
+                    separator = "&" if "?" in url else "?"
+                    self.assert_indexed(
+                        "get", f"{url}{separator}after={page.next_cursor}"
+                    )
+
+    def test_api_views(self):
+        post = self.posts[-1]
+        urls = [
+            reverse("api_posts"),
+            reverse("api_posts") + "?fields=id,text",
+            reverse("api_group_posts", args=[self.group.slug]),
+            reverse("api_profile_posts", args=[self.author.username]),
+            reverse("api_follow") + "?fields=text,author",
+            reverse("api_post", args=[post.id]),
+            reverse("api_post_comments", args=[post.id]) + "?limit=2",
+            reverse("api_groups"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.assert_indexed("get", url)
+                if not response.streaming:
+                    continue
+                data = json.loads(b"".join(response.streaming_content))
+                if data["next_cursor"]:
+                    separator = "&" if "?" in url else "?"
+                    self.assert_indexed(
+                        "get", f"{url}{separator}after={data['next_cursor']}"
+                    )
+
+    def test_write_views(self):
+        post = self.posts[0]
+        cases = [
+            (reverse("add_comment", args=[post.id]), {"text": "Ещё"}),
+            (reverse("profile_unfollow", args=["author"]), None),
+            (reverse("profile_follow", args=["author"]), None),
+            (reverse("follow_bulk"), {"unfollow": "author"}),
+            (reverse("follow_bulk"), {"follow": "author"}),
+        ]
+        for url, data in cases:
+            with self.subTest(url=url):
+                self.assert_indexed("post" if data else "get", url, data)
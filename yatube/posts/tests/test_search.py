@@ -0,0 +1,96 @@
+from io import StringIO
+
+from django.contrib.admin.sites import site
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post, User
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.apple = Post.objects.create(
+            text="Яблоки созрели, собираем яблоки", author=cls.author
+        )
+        cls.pear = Post.objects.create(
+            text="Груши и яблоко <b>в саду</b>", author=cls.author
+        )
+        cls.other = Post.objects.create(text="Про погоду", author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, **params):
+        return self.client.get(reverse("search"), {"q": query, **params})
+
+    def test_results_are_ranked_and_highlighted(self):
+        response = self.search("ЯБЛОК")
+        page = response.context["page_obj"]
+        self.assertEqual(list(page), [self.apple, self.pear])
+        self.assertIn("<mark>Яблоки</mark>", page[0].snippet)
+        # Текст поста экранирован, разметка - только от подсветки.
+        self.assertIn("&lt;b&gt;", page[1].snippet)
+
+    def test_all_words_must_match(self):
+        response = self.search("груши яблоко")
+        self.assertEqual(list(response.context["page_obj"]), [self.pear])
+
+    def test_fts_syntax_is_not_interpreted(self):
+        for query in ('яблоки"', "NEAR(", "text:*", "яблоки OR"):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query).status_code, 200)
+        self.assertIsNone(self.search("").context["page_obj"])
+        self.assertEqual(len(self.search("!!!").context["page_obj"]), 0)
+
+    def test_index_follows_edits_and_deletes(self):
+        self.other.text = "Погода для яблок"
+        self.other.save()
+        Post.objects.filter(id=self.pear.id).update(text="Только груши")
+        Post.objects.filter(id=self.apple.id).delete()
+        response = self.search("яблок")
+        self.assertEqual(list(response.context["page_obj"]), [self.other])
+
+    def test_cursor_pages_keep_query(self):
+        Post.objects.bulk_create(
+            Post(text=f"Сад номер {i}", author=self.author) for i in range(12)
+        )
+        first = self.search("сад").context["page_obj"]
+        self.assertEqual(len(first), 10)
+        self.assertContains(
+            self.search("сад"), "?q=%D1%81%D0%B0%D0%B4&after="
+        )
+        second = self.search("сад", after=first.next_cursor).context[
+            "page_obj"
+        ]
+        self.assertEqual(len(second), 3)
+        self.assertFalse(set(first) & set(second))
+        back = self.search("сад", before=second.previous_cursor).context[
+            "page_obj"
+        ]
+        self.assertEqual(list(back), list(first))
+
+    def test_admin_uses_index(self):
+        request = RequestFactory().get("/admin/posts/post/")
+        admin = site._registry[Post]
+        queryset, distinct = admin.get_search_results(
+            request, Post.objects.all(), "яблок"
+        )
+        self.assertFalse(distinct)
+        self.assertIn(search.TABLE, str(queryset.query))
+        self.assertEqual(set(queryset), {self.apple, self.pear})
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {search.TABLE} ({search.TABLE}) "
+                "VALUES ('delete-all')"
+            )
+        self.assertEqual(len(self.search("погоду").context["page_obj"]), 0)
+        call_command("rebuild_search_index", stdout=StringIO())
+        response = self.search("погоду")
+        self.assertEqual(list(response.context["page_obj"]), [self.other])
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from yatube.sqlite.base import DatabaseWrapper, pragma_statements
+
+from ..retry import retry_on_locked
+
+
+class PragmaTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_connection_is_tuned(self):
+        self.assertEqual(self.pragma("busy_timeout"), 5000)
+        self.assertEqual(self.pragma("cache_size"), -16000)
+        # NORMAL и MEMORY в числовом виде.
+        self.assertEqual(self.pragma("synchronous"), 1)
+        self.assertEqual(self.pragma("temp_store"), 2)
+        self.assertEqual(self.pragma("foreign_keys"), 1)
+
+    def test_statements_are_validated(self):
+        self.assertEqual(
+            pragma_statements({"journal_mode": "WAL", "cache_size": -100}),
+            ["PRAGMA journal_mode = WAL", "PRAGMA cache_size = -100"],
+        )
+        for pragmas in (
+            {"journal_mode": "WAL; DROP TABLE posts_post"},
+            {"cache size": 10},
+        ):
+            with self.subTest(pragmas=pragmas):
+                with self.assertRaises(ImproperlyConfigured):
+                    pragma_statements(pragmas)
+
+    def test_immediate_transaction_takes_write_lock(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "db.sqlite3")
+
+        def open_database(mode):
+            wrapper = DatabaseWrapper(
+                dict(
+                    connection.settings_dict,
+                    NAME=path,
+                    OPTIONS={
+                        "transaction_mode": mode,
+                        "pragmas": {"busy_timeout": 0},
+                    },
+                ),
+                alias="lock_test",
+            )
+            wrapper.ensure_connection()
+            self.addCleanup(wrapper.close)
+            return wrapper
+
+        for mode, locked in (("DEFERRED", False), ("IMMEDIATE", True)):
+            with self.subTest(mode=mode):
+                reader = open_database(mode)
+                writer = open_database(mode)
+                reader._start_transaction_under_autocommit()
+                try:
+                    writer.cursor().execute(f"CREATE TABLE {mode} (x)")
+                except OperationalError:
+                    self.assertTrue(locked)
+                else:
+                    self.assertFalse(locked)
+                finally:
+                    reader.connection.rollback()
+        with self.assertRaises(ImproperlyConfigured):
+            open_database("LATER")
+
+
+@override_settings(DB_RETRY_ATTEMPTS=3, DB_RETRY_BACKOFF=0)
+@mock.patch("posts.retry.time.sleep")
+class RetryTest(SimpleTestCase):
+    databases = {"default"}
+
+    def view(self, *errors):
+        calls = []
+
+        @retry_on_locked
+        def view(request):
+            calls.append(connection.in_atomic_block)
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return "ok"
+
+        return view, calls
+
+    def test_locked_write_is_retried(self, sleep):
+        locked = OperationalError("database is locked")
+        view, calls = self.view(locked, locked)
+        self.assertEqual(view(None), "ok")
+        self.assertEqual(calls, [True, True, True])
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_gives_up_after_attempts(self, sleep):
+        locked = OperationalError("database is locked")
+        view, calls = self.view(locked, locked, locked)
+        with self.assertRaises(OperationalError):
+            view(None)
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_are_not_retried(self, sleep):
+        view, calls = self.view(OperationalError("no such table: x"))
+        with self.assertRaises(OperationalError):
+            view(None)
+        self.assertEqual(len(calls), 1)
+        sleep.assert_not_called()
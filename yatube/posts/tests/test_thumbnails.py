@@ -0,0 +1,168 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from .. import thumbnails
+from ..models import Post, User
+from ..templatetags.post_cards import card_key
+
+TEMP_MEDIA = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_file(name="pic.png"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 20), (255, 0, 0)).save(buffer, "png")
+    return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+
+def run_on_commit(callback):
+    callback()
+
+
+# Миниатюры создаются прямо в запросе, и его запросы к базе выходят за
+# бюджет представления - в проде их делает пул.
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA, THUMBNAIL_WORKERS=0, QUERY_BUDGET_CHECK=False
+)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.url = reverse("profile", args=[self.author.username])
+
+    def ready(self, post):
+        picture = thumbnails.card_picture(post.image)
+        return picture if picture and picture.complete else None
+
+    def test_placeholder_until_thumbnail_exists(self):
+        post = Post.objects.create(
+            text="с картинкой", author=self.author, image=image_file()
+        )
+        with mock.patch.object(thumbnails, "_submit") as submit:
+            response = self.client.get(self.url)
+        # В TestCase нет коммита: рендер только ставит пост в очередь.
+        self.assertContains(response, thumbnails.PENDING_MARKER)
+        self.assertNotContains(response, "card-img\" src=")
+        self.assertIsNone(self.ready(post))
+        submit.assert_not_called()
+        # Карточка с заглушкой не закеширована.
+        key = card_key(post, self.author, is_owner=True)
+        self.assertIsNone(cache.get(key))
+
+    @mock.patch("posts.thumbnails.transaction.on_commit", run_on_commit)
+    def test_create_queues_thumbnails(self):
+        self.client.post(
+            reverse("create"), {"text": "новый", "image": image_file()}
+        )
+        post = Post.objects.get(text="новый")
+        picture = self.ready(post)
+        self.assertIsNotNone(picture)
+        fallback = picture.fallback
+        self.assertEqual((fallback.width, fallback.height), (960, 339))
+        response = self.client.get(self.url)
+        self.assertContains(response, fallback.url)
+        self.assertContains(response, picture.srcset)
+        self.assertNotContains(response, thumbnails.PENDING_MARKER)
+        for width in thumbnails.CARD_WIDTHS:
+            self.assertIn(f" {width}w", picture.srcset)
+        self.assertEqual(
+            [source["type"] for source in picture.sources],
+            [thumbnails.MIME_TYPES[fmt] for fmt in thumbnails.MODERN_FORMATS],
+        )
+
+    def test_incomplete_variants_are_not_cached(self):
+        post = Post.objects.create(
+            text="старая", author=self.author, image=image_file()
+        )
+        # Так выглядит пост, миниатюра которого сделана до <picture>.
+        get_thumbnail(post.image, "960x339", crop="center", upscale=True)
+        with mock.patch.object(thumbnails, "_submit"):
+            response = self.client.get(self.url)
+        picture = thumbnails.card_picture(post.image)
+        self.assertFalse(picture.complete)
+        self.assertContains(response, picture.fallback.url)
+        self.assertContains(response, thumbnails.PENDING_MARKER)
+        key = card_key(post, self.author, is_owner=True)
+        self.assertIsNone(cache.get(key))
+
+    @mock.patch("posts.thumbnails.transaction.on_commit", run_on_commit)
+    def test_edit_queues_only_new_image(self):
+        post = Post.objects.create(text="текст", author=self.author)
+        url = reverse("post_edit", args=[post.id])
+        with mock.patch.object(thumbnails, "_submit") as submit:
+            self.client.post(url, {"text": "правка"})
+        submit.assert_not_called()
+        self.client.post(url, {"text": "правка", "image": image_file()})
+        post.refresh_from_db()
+        self.assertIsNotNone(self.ready(post))
+
+    def test_broken_image_keeps_page_cache(self):
+        post = Post.objects.create(
+            text="битая", author=self.author, image="posts/missing.jpg"
+        )
+        self.client.get(self.url)
+        with mock.patch("posts.thumbnails.page_cache.bump") as bump:
+            with self.assertLogs("sorl.thumbnail.base", "ERROR"):
+                thumbnails.generate(post.id)
+        bump.assert_not_called()
+        self.assertIsNone(self.ready(post))
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_pool_takes_each_post_once(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def generate(post_id):
+            calls.append((post_id, threading.current_thread().name))
+            started.set()
+            release.wait(5)
+
+        with mock.patch.object(thumbnails, "_executor", None):
+            with mock.patch.object(thumbnails, "generate", generate):
+                thumbnails._submit(1)
+                self.assertTrue(started.wait(5))
+                # Пост ещё в работе: второй раз в очередь не ставится.
+                thumbnails._submit(1)
+                release.set()
+                thumbnails._executor.shutdown(wait=True)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(calls[0][1].startswith("thumbnails"))
+        self.assertNotIn(1, thumbnails._pending)
+
+    def test_warm_command_resumes(self):
+        posts = [
+            Post.objects.create(
+                text=str(i), author=self.author, image=image_file()
+            )
+            for i in range(3)
+        ]
+        checkpoint = os.path.join(TEMP_MEDIA, "cache", ".warm_thumbnails")
+        os.makedirs(os.path.dirname(checkpoint), exist_ok=True)
+        with open(checkpoint, "w") as file:
+            file.write(str(posts[0].id))
+        out = io.StringIO()
+        call_command("warm_thumbnails", workers=0, resume=True, stdout=out)
+        self.assertIn("Готово: 2 картинок", out.getvalue())
+        self.assertIsNone(self.ready(posts[0]))
+        self.assertTrue(all(self.ready(post) for post in posts[1:]))
+        with open(checkpoint) as file:
+            self.assertEqual(file.read(), str(posts[2].id))
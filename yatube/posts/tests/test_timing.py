@@ -0,0 +1,86 @@
+import re
+import time
+
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timing
+from ..models import Post, User
+
+ENTRY = re.compile(r'^(\w+);dur=([\d.-]+)(;desc="[^"]*")?$')
+
+
+def parse(header):
+    entries = {}
+    for part in header.split(", "):
+        match = ENTRY.match(part)
+        entries[match.group(1)] = float(match.group(2))
+    return entries
+
+
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.post = Post.objects.create(text="Пост", author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_header_splits_request_time(self):
+        response = self.client.get(reverse("index"))
+        entries = parse(response["Server-Timing"])
+        for name in ("db", "tpl", "cache", "app", "total"):
+            self.assertIn(name, entries)
+        # Вложенное время не считается дважды.
+        parts = sum(
+            duration
+            for name, duration in entries.items()
+            if name != "total"
+        )
+        self.assertAlmostEqual(parts, entries["total"], delta=0.2)
+        self.assertRegex(
+            response["Server-Timing"], r"\d+ calls: \d+ hits \d+ misses"
+        )
+
+    def test_cached_page_skips_templates(self):
+        self.client.get(reverse("index"))
+        response = self.client.get(reverse("index"))
+        entries = parse(response["Server-Timing"])
+        self.assertNotIn("tpl", entries)
+        self.assertNotIn("db", entries)
+        # Страница и версия тега index, заведённая первым запросом.
+        self.assertIn('"2 calls: 2 hits 0 misses"', response["Server-Timing"])
+
+    def test_log_line(self):
+        with self.assertLogs("posts.timing", "INFO") as logs:
+            self.client.get(reverse("post", args=[self.post.id]))
+        (line,) = logs.output
+        self.assertIn("view=post status=200", line)
+        self.assertRegex(line, r"db_ms=[\d.]+ db_count=\d+")
+
+    @override_settings(SERVER_TIMING=False)
+    def test_disabled(self):
+        response = self.client.get(reverse("index"))
+        self.assertNotIn("Server-Timing", response)
+
+
+class MeasureTest(SimpleTestCase):
+    def test_nested_time_is_exclusive(self):
+        timer = timing._local.timer = timing.Timer()
+        self.addCleanup(setattr, timing._local, "timer", None)
+        with timing.measure("tpl"):
+            time.sleep(0.01)
+            with timing.measure("db"):
+                time.sleep(0.02)
+        self.assertEqual(timer.counts, {"tpl": 1, "db": 1})
+        self.assertAlmostEqual(timer.durations["db"], 0.02, delta=0.01)
+        self.assertAlmostEqual(timer.durations["tpl"], 0.01, delta=0.01)
+
+    def test_noop_outside_request(self):
+        with timing.measure("db"):
+            pass
+        timing.count("cache_hits")
+        self.assertIsNone(timing.current())
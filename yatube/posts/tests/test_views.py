@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from posts.models import Group, Post, Comment, Follow
+from posts.models import Group, Post, Comment, Follow, TimelineEntry
 from django.core.cache import cache
 
 User = get_user_model()
@@ -167,6 +167,67 @@ class PostPagesTests(TestCase):
         self.assertEqual(response_count_last, following_count)
 
 
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="writer")
+        self.reader = User.objects.create_user(username="reader")
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        response = self.client.get(reverse("follow_index"))
+        return [post.text for post in response.context["page_obj"]]
+
+    def test_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text="новый", author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader, post__text="новый"
+            ).exists()
+        )
+        self.assertEqual(self.feed(), ["новый"])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        Post.objects.create(text="старый", author=self.author)
+        self.client.get(
+            reverse("profile_follow", args=[self.author.username])
+        )
+        self.assertEqual(self.feed(), ["старый"])
+        self.client.get(
+            reverse("profile_unfollow", args=[self.author.username])
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_pulled_at_read(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        other = User.objects.create_user(username="other")
+        Follow.objects.create(user=self.reader, author=other)
+        Post.objects.create(text="первый", author=self.author)
+        Post.objects.create(text="второй", author=other)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), ["второй", "первый"])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_back_under_limit_is_fanned_out(self):
+        other = User.objects.create_user(username="other")
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        Post.objects.create(text="выше порога", author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.client.force_login(other)
+        self.client.get(
+            reverse("profile_unfollow", args=[self.author.username])
+        )
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list("user", "post__text")),
+            [(self.reader.id, "выше порога")],
+        )
+        self.client.force_login(self.reader)
+        self.assertEqual(self.feed(), ["выше порога"])
+
+
 class TestComment(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -269,3 +330,135 @@ class PaginatorViewsTest(TestCase):
             reverse("profile", kwargs={"username": f"{self.author}"})
         )
         self.assertEqual(len(response.context.get("page_obj").object_list), 10)
+
+    def test_cursor_pages(self):
+        """Курсоры ?after=/?before= листают ленту без пропусков и повторов"""
+        first = self.client.get(reverse("index")).context["page_obj"]
+        self.assertEqual(len(first), 10)
+        self.assertIsNone(first.previous_cursor)
+        second = self.client.get(
+            reverse("index") + f"?after={first.next_cursor}"
+        ).context["page_obj"]
+        self.assertEqual(len(second), 3)
+        self.assertIsNone(second.next_cursor)
+        ids = [post.id for post in list(first) + list(second)]
+        self.assertEqual(
+            ids, list(Post.objects.order_by("-pub_date", "-id").values_list(
+                "id", flat=True
+            ))
+        )
+        back = self.client.get(
+            reverse("index") + f"?before={second.previous_cursor}"
+        ).context["page_obj"]
+        self.assertEqual([post.id for post in back], ids[:10])
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.client.get(
+            reverse("profile", kwargs={"username": f"{self.author}"})
+            + "?after=not-a-cursor"
+        )
+        self.assertEqual(len(response.context["page_obj"]), 10)
+        self.assertFalse(response.context["page_obj"].has_previous())
+
+
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.post = Post.objects.create(text="Пост", author=cls.author)
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f"Комментарий {i}"
+            )
+            for i in range(25)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_post_shows_first_comments_in_order(self):
+        response = self.client.get(reverse("post", args=[self.post.id]))
+        page = response.context["comments"]
+        self.assertEqual(list(page), self.comments[:20])
+        fragment = reverse("post_comments", args=[self.post.id])
+        self.assertContains(
+            response, f'data-comments-more="{fragment}?after='
+        )
+
+    def test_fragment_returns_next_comments(self):
+        first = self.client.get(
+            reverse("post", args=[self.post.id])
+        ).context["comments"]
+        response = self.client.get(
+            reverse("post_comments", args=[self.post.id])
+            + f"?after={first.next_cursor}"
+        )
+        self.assertTemplateUsed(response, "includes/comment_list.html")
+        self.assertEqual(
+            list(response.context["comments"]), self.comments[20:]
+        )
+        self.assertNotContains(response, "data-comments-more")
+        self.assertNotContains(response, "<html")
+        # Без JavaScript та же порция открывается на странице поста.
+        response = self.client.get(
+            reverse("post", args=[self.post.id])
+            + f"?after={first.next_cursor}"
+        )
+        self.assertEqual(
+            list(response.context["comments"]), self.comments[20:]
+        )
+        self.assertContains(response, "К первым комментариям")
+
+    def test_fragment_of_missing_post(self):
+        response = self.client.get(
+            reverse("post_comments", args=[self.post.id + 1])
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class FeedFragmentTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(title="Группа", slug="group")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            Post.objects.create(
+                text=f"Пост {i}", author=cls.author, group=cls.group
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def test_fragment_continues_the_feed(self):
+        for url in (
+            reverse("index"),
+            reverse("group", args=[self.group.slug]),
+            reverse("profile", args=[self.author.username]),
+            reverse("follow_index"),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                cursor = response.context["page_obj"].next_cursor
+                self.assertContains(
+                    response, f'data-feed-next="?after={cursor}&fragment=1"'
+                )
+                self.assertContains(response, "<script>", count=1)
+                response = self.client.get(
+                    url, {"after": cursor, "fragment": "1"}
+                )
+                self.assertContains(response, "Пост 4")
+                self.assertNotContains(response, "Пост 5")
+                for absent in ("<html", "<script", "data-feed-next"):
+                    self.assertNotContains(response, absent)
+
+    def test_first_fragment_has_next_marker(self):
+        response = self.client.get(reverse("index"), {"fragment": "1"})
+        self.assertContains(response, "Пост 14")
+        self.assertContains(response, "data-feed-next=")
+        self.assertNotContains(response, "<nav class=\"navbar")
+        self.assertNotContains(response, "<script")
@@ -0,0 +1,217 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Шаблоны не создают миниатюры сами: тег ``{% ready_thumbnail %}`` только
+ищет готовую в key-value store sorl, а если её нет - ставит пост в
+очередь и отдаёт ``None``, и шаблон показывает заглушку. Очередь
+разбирает пул потоков процесса (Pillow отпускает GIL при декодировании
+и ресайзе). Когда миниатюры готовы, страницы с постом сбрасываются из
+кеша, и следующий просмотр получает уже ``<img>``.
+
+Карточка поста выводит ``<picture>``: несколько ширин в AVIF и WebP
+(если сборка Pillow их умеет) и JPEG как запасной вариант, чтобы
+мобильный браузер скачивал картинку под свой экран.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+from PIL import features
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import page_cache, timing
+from .models import Post
+from .signals import post_tags
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pillow_avif  # noqa: F401 - регистрирует AVIF в Pillow
+except ImportError:
+    pillow_avif = None
+else:
+    EXTENSIONS.setdefault("AVIF", "avif")
+
+MIME_TYPES = {"AVIF": "image/avif", "WEBP": "image/webp"}
+# Современные форматы, которые умеет сохранять Pillow, от лучшего сжатия.
+MODERN_FORMATS = tuple(
+    fmt
+    for fmt, available in (
+        ("AVIF", pillow_avif is not None),
+        ("WEBP", features.check("webp")),
+    )
+    if available
+)
+
+CARD_SIZE = (960, 339)
+CARD_WIDTHS = (480, 720, 960)
+CARD_OPTIONS = {"crop": "center", "upscale": True}
+
+
+def card_geometry(width):
+    return f"{width}x{round(width * CARD_SIZE[1] / CARD_SIZE[0])}"
+
+
+def card_variants():
+    """(ширина, формат) всех вариантов картинки карточки.
+
+    Формат None - формат sorl по умолчанию (JPEG): запасной вариант для
+    браузеров без AVIF и WebP.
+    """
+    return [
+        (width, fmt)
+        for width in CARD_WIDTHS
+        for fmt in MODERN_FORMATS + (None,)
+    ]
+
+
+def variant_options(fmt):
+    return dict(CARD_OPTIONS, format=fmt) if fmt else dict(CARD_OPTIONS)
+
+
+# Геометрии, которые выводят шаблоны. Их миниатюры готовятся заранее.
+GEOMETRIES = tuple(
+    (card_geometry(width), variant_options(fmt))
+    for width, fmt in card_variants()
+)
+# Атрибут заглушки: по нему кеш карточек узнаёт незаконченную карточку.
+PENDING_MARKER = "data-thumbnail-pending"
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+class LookupBackend(ThumbnailBackend):
+    def get_thumbnail(self, file_, geometry_string, **options):
+        with timing.measure("thumb"):
+            return super().get_thumbnail(file_, geometry_string, **options)
+
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None - без чтения и ресайза исходника.
+
+        Имя миниатюры считается так же, как в ``get_thumbnail()``.
+        """
+        with timing.measure("thumb"):
+            return self._lookup(file_, geometry_string, options)
+
+    def _lookup(self, file_, geometry_string, options):
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault("format", self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = LookupBackend()
+
+
+def lookup(image, geometry, **options):
+    return backend.lookup(image, geometry, **options) if image else None
+
+
+class Picture:
+    """Готовые варианты картинки карточки для ``<picture>``."""
+
+    def __init__(self, variants):
+        self.variants = variants
+        self.fallback = variants[(CARD_SIZE[0], None)]
+        self.srcset = self._srcset(None)
+        self.sources = [
+            {"type": MIME_TYPES[fmt], "srcset": self._srcset(fmt)}
+            for fmt in MODERN_FORMATS
+            if self._srcset(fmt)
+        ]
+        self.complete = all(variants.values())
+
+    def _srcset(self, fmt):
+        return ", ".join(
+            f"{self.variants[(width, fmt)].url} {width}w"
+            for width in CARD_WIDTHS
+            if self.variants[(width, fmt)] is not None
+        )
+
+
+def card_picture(image):
+    """Варианты картинки карточки или None, если нет даже запасного."""
+    if not image:
+        return None
+    variants = {
+        (width, fmt): lookup(
+            image, card_geometry(width), **variant_options(fmt)
+        )
+        for width, fmt in card_variants()
+    }
+    if variants[(CARD_SIZE[0], None)] is None:
+        return None
+    return Picture(variants)
+
+
+def create(image):
+    """Создать миниатюры всех известных геометрий; True, если все готовы.
+
+    Битую или пропавшую картинку sorl не сохраняет - тогда False.
+    """
+    for geometry, options in GEOMETRIES:
+        backend.get_thumbnail(image, geometry, **options)
+    return all(
+        lookup(image, geometry, **options) for geometry, options in GEOMETRIES
+    )
+
+
+def generate(post_id):
+    """Создать миниатюры поста и сбросить страницы с ним из кеша."""
+    post = Post.objects.filter(id=post_id).first()
+    if post is not None and post.image and create(post.image):
+        # Страница поста изменилась (заглушка стала картинкой): новые
+        # updated и версии тегов - и для кеша страниц, и для ETag.
+        Post.objects.filter(id=post_id).update(updated=timezone.now())
+        page_cache.bump(*post_tags(post))
+
+
+def _work(post_id, in_pool):
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception("Не удалось создать миниатюры поста %s", post_id)
+    finally:
+        with _lock:
+            _pending.discard(post_id)
+        if in_pool:
+            # Соединение потока пула само не закроется.
+            connection.close()
+
+
+def _submit(post_id):
+    global _executor
+    workers = settings.THUMBNAIL_WORKERS
+    with _lock:
+        if post_id in _pending:
+            return
+        _pending.add(post_id)
+        if workers and _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="thumbnails"
+            )
+    if workers:
+        _executor.submit(_work, post_id, True)
+    else:
+        _work(post_id, False)
+
+
+def schedule(post):
+    """Поставить пост в очередь после коммита - когда воркер его увидит."""
+    if post.image:
+        transaction.on_commit(lambda: _submit(post.id))
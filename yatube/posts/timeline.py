@@ -0,0 +1,199 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост раскладывается в ``TimelineEntry`` каждого подписчика автора,
+подписка дозаполняет ленту постами автора, отписка - вычищает их.
+Посты авторов, у которых подписчиков больше ``TIMELINE_FANOUT_LIMIT``,
+не раскладываются: их лента подтягивает при чтении (pull), чтобы один
+пост не превращался в миллион вставок.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .pagination import CursorPaginator
+from .prerender import FULL_TEXT_FIELDS
+
+BATCH_SIZE = 500
+
+
+def _batches(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def is_pulled(author_id):
+    """Слишком много подписчиков: посты автора подтягиваются при чтении."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        follower_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def pulled_authors(user):
+    """Авторы из подписок ``user``, чьи посты не раскладываются по лентам."""
+    return list(
+        UserStats.objects.filter(
+            user__following__user=user,
+            follower_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list("user_id", flat=True)
+    )
+
+
+def fan_out(post):
+    """Разложить новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        "user_id", flat=True
+    )
+    for batch in _batches(followers.iterator()):
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    user_id=user_id,
+                    post=post,
+                    author_id=post.author_id,
+                    pub_date=post.pub_date,
+                )
+                for user_id in batch
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def _insert_followed_posts(where="", params=()):
+    """Разложить посты авторов по лентам их подписчиков одним
+    INSERT ... SELECT; ``where`` сужает подписки (псевдоним ``f``).
+    Посты авторов, которых подтягивают при чтении, пропускаются."""
+    ops = connection.ops
+    entry, follow, post, stats = (
+        ops.quote_name(model._meta.db_table)
+        for model in (TimelineEntry, Follow, Post, UserStats)
+    )
+    sql = (
+        f"{ops.insert_statement(ignore_conflicts=True)} {entry} "
+        "(user_id, post_id, author_id, pub_date) "
+        "SELECT f.user_id, p.id, p.author_id, p.pub_date "
+        f"FROM {follow} f JOIN {post} p ON p.author_id = f.author_id "
+        f"LEFT JOIN {stats} s ON s.user_id = f.author_id "
+        f"WHERE COALESCE(s.follower_count, 0) <= %s {where} "
+        f"{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [settings.TIMELINE_FANOUT_LIMIT, *params])
+        return cursor.rowcount
+
+
+def backfill(user_id, author_ids):
+    """Дозаполнить ленту подписчика постами авторов после подписки."""
+    inserted = 0
+    for batch in _batches(author_ids):
+        placeholders = ", ".join(["%s"] * len(batch))
+        inserted += _insert_followed_posts(
+            f"AND f.user_id = %s AND f.author_id IN ({placeholders})",
+            [user_id, *batch],
+        )
+    return inserted
+
+
+def refill(author_ids):
+    """Разложить посты авторов, которых перестали подтягивать при чтении.
+
+    Вызывается после отписок: если подписчиков у автора стало ровно
+    ``TIMELINE_FANOUT_LIMIT``, его посты, опубликованные выше порога, ни
+    в одну ленту не раскладывались и без этого пропали бы из лент.
+    """
+    inserted = 0
+    for batch in _batches(author_ids):
+        placeholders = ", ".join(["%s"] * len(batch))
+        inserted += _insert_followed_posts(
+            f"AND s.follower_count = %s AND f.author_id IN ({placeholders})",
+            [settings.TIMELINE_FANOUT_LIMIT, *batch],
+        )
+    return inserted
+
+
+def rebuild():
+    """Разложить по лентам все посты всех подписок.
+
+    Для загрузки данных целиком: ``backfill`` на каждую подписку делал бы
+    по запросу на подписку. Счётчики подписчиков (``UserStats``) должны
+    быть уже пересчитаны.
+    """
+    return _insert_followed_posts()
+
+
+def prune(user_id, author_ids):
+    """Убрать посты авторов из ленты после отписки."""
+    for batch in _batches(author_ids):
+        TimelineEntry.objects.filter(
+            user_id=user_id, author_id__in=batch
+        ).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорная пагинация ленты подписок.
+
+    Страница собирается из материализованной ленты пользователя и, если
+    он подписан на «тяжёлых» авторов, из их постов, подтянутых при
+    чтении. ``object_list`` - обычный запрос постов подписок, он нужен
+    только для старых ссылок ``?page=N``.
+
+    ``related`` - связи поста, подтягиваемые вместе с записями ленты,
+    ``only`` - если задан, читать только эти поля поста (как у
+    ``QuerySet.only()``); иначе не читаются ``FULL_TEXT_FIELDS``.
+    """
+
+    def __init__(
+        self, object_list, per_page, user, related=("author", "group"),
+        only=None,
+    ):
+        super().__init__(object_list, per_page)
+        self.entries = TimelineEntry.objects.filter(user=user).select_related(
+            "post", *(f"post__{name}" for name in related)
+        )
+        if only is not None:
+            self.entries = self.entries.only(
+                "pub_date", "post", *(f"post__{name}" for name in only)
+            )
+        else:
+            # Лента выводит превью: полный текст постов не читаем.
+            self.entries = self.entries.defer(
+                *(f"post__{name}" for name in FULL_TEXT_FIELDS)
+            )
+        authors = pulled_authors(user)
+        self.pulled = (
+            object_list.filter(author__in=authors) if authors else None
+        )
+
+    def _rows(self, values, newer, limit):
+        entries, pulled = self.entries, self.pulled
+        if values is not None:
+            entries = entries.filter(
+                self._seek(values, newer, keys=("pub_date", "post"))
+            )
+        # post_id, а не post: сортировка по связи взяла бы Post.ordering.
+        ordering = (
+            ("pub_date", "post_id") if newer else ("-pub_date", "-post_id")
+        )
+        rows = [entry.post for entry in entries.order_by(*ordering)[:limit]]
+        if pulled is None:
+            return rows
+        if values is not None:
+            pulled = pulled.filter(self._seek(values, newer))
+        ordering = ("pub_date", "id") if newer else ("-pub_date", "-id")
+        # Пост «тяжёлого» автора мог попасть в ленту, пока подписчиков
+        # было меньше порога, поэтому дубли убираем по id.
+        seen = {post.id for post in rows}
+        rows += [
+            post
+            for post in pulled.order_by(*ordering)[:limit]
+            if post.id not in seen
+        ]
+        rows.sort(key=lambda post: (post.pub_date, post.id), reverse=not newer)
+        return rows[:limit]
@@ -0,0 +1,194 @@
+"""Куда ушло время запроса: SQL, шаблоны, кеш, миниатюры.
+
+``ServerTimingMiddleware`` заводит на запрос таймер, и участки кода
+отмечаются блоком ``with measure("db"):``. Время вложенных блоков
+вычитается из внешнего: рендер шаблона, который сам выполнил SQL и
+сходил в кеш, даёт ``tpl`` без этих запросов, и все метрики вместе с
+``app`` (остальной Python) складываются в ``total``.
+
+Итог уходит в заголовок ``Server-Timing`` (виден во вкладке Network
+браузера) и строкой ``key=value`` в логгер ``posts.timing`` уровня
+INFO. Без таймера (вне запроса, в потоках пула миниатюр) ``measure()``
+ничего не делает; включается настройкой ``SERVER_TIMING``.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+# Метрики в порядке вывода и что считает их счётчик. Заголовок - только
+# latin-1, поэтому описания по-английски.
+METRICS = {
+    "db": "queries",
+    "tpl": "templates",
+    "cache": "calls",
+    "thumb": "calls",
+}
+
+_local = threading.local()
+
+
+class Timer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.counts = Counter()
+        # Время вложенных блоков для каждого открытого блока.
+        self._nested = []
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def metrics(self, total):
+        """(имя, миллисекунды, число вызовов) - только то, что было."""
+        rows = [
+            (name, self.durations[name] * 1000, self.counts[name])
+            for name in METRICS
+            if self.counts[name]
+        ]
+        app = total - sum(self.durations.values())
+        return rows + [("app", app * 1000, 0), ("total", total * 1000, 0)]
+
+
+def current():
+    return getattr(_local, "timer", None)
+
+
+@contextmanager
+def measure(name):
+    """Засчитать время блока в метрику ``name`` текущего запроса."""
+    timer = current()
+    if timer is None:
+        yield
+        return
+    timer.counts[name] += 1
+    timer._nested.append(0.0)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timer.durations[name] += elapsed - timer._nested.pop()
+        if timer._nested:
+            timer._nested[-1] += elapsed
+
+
+def count(name, value=1):
+    """Добавить к счётчику текущего запроса (попадания в кеш и т. п.)."""
+    timer = current()
+    if timer is not None:
+        timer.counts[name] += value
+
+
+def cache_lookup(keys, found):
+    """Учесть попадания и промахи кеша для запрошенных ``keys``."""
+    count("cache_hits", len(found))
+    count("cache_misses", len(keys) - len(found))
+
+
+def _database(execute, sql, params, many, context):
+    with measure("db"):
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def request_timer():
+    """Таймер запроса; если его уже завёл внешний middleware - тот же."""
+    timer = current()
+    if timer is not None:
+        yield timer
+        return
+    timer = _local.timer = Timer()
+    try:
+        with connection.execute_wrapper(_database):
+            yield timer
+    finally:
+        _local.timer = None
+
+
+def _description(name, timer):
+    description = f"{timer.counts[name]} {METRICS[name]}"
+    if name == "cache":
+        description += (
+            f": {timer.counts['cache_hits']} hits "
+            f"{timer.counts['cache_misses']} misses"
+        )
+    return description
+
+
+def header(timer, total):
+    parts = []
+    for name, duration, calls in timer.metrics(total):
+        part = f"{name};dur={duration:.1f}"
+        if calls:
+            part += f';desc="{_description(name, timer)}"'
+        parts.append(part)
+    return ", ".join(parts)
+
+
+def log_line(request, response, timer, total):
+    match = request.resolver_match
+    fields = [
+        ("method", request.method),
+        ("path", request.path),
+        ("view", match.view_name if match else "-"),
+        ("status", response.status_code),
+    ]
+    for name, duration, calls in timer.metrics(total):
+        fields.append((f"{name}_ms", f"{duration:.1f}"))
+        if calls:
+            fields.append((f"{name}_count", calls))
+    for name in ("cache_hits", "cache_misses"):
+        if timer.counts[name]:
+            fields.append((name, timer.counts[name]))
+    return " ".join(f"{key}={value}" for key, value in fields)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "SERVER_TIMING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_timer() as timer:
+            response = self.get_response(request)
+        total = timer.total()
+        response["Server-Timing"] = header(timer, total)
+        logger.info(
+            log_line(request, response, timer, total),
+            extra={"timing": dict(timer.durations), "counts": timer.counts},
+        )
+        return response
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with measure("tpl"):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Шаблонизатор Django, замеряющий рендер шаблонов верхнего уровня.
+
+    Вложенные ``{% include %}`` рендерятся внутри них и в замер уже
+    входят.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -2,12 +2,15 @@ from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
 
-from . import views
+from . import api, views
 
 
 urlpatterns = [
     path("", views.index, name="index"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("follow/bulk/", views.follow_bulk, name="follow_bulk"),
+    path("search/", views.search, name="search"),
+    path("metrics/", views.metrics, name="metrics"),
     path(
         "profile/<str:username>/follow/",
         views.profile_follow,
@@ -29,7 +32,31 @@ urlpatterns = [
     ),
     path("profile/<str:username>/", views.profile, name="profile"),
     path("posts/<int:post_id>/", views.post_view, name="post"),
+    path(
+        "posts/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments",
+    ),
     path("posts/<int:post_id>/edit/", views.post_edit, name="post_edit"),
+    path("api/v1/posts/", api.posts, name="api_posts"),
+    path("api/v1/posts/<int:post_id>/", api.post, name="api_post"),
+    path(
+        "api/v1/posts/<int:post_id>/comments/",
+        api.post_comments,
+        name="api_post_comments",
+    ),
+    path("api/v1/groups/", api.groups, name="api_groups"),
+    path(
+        "api/v1/groups/<slug:slug>/posts/",
+        api.group_posts,
+        name="api_group_posts",
+    ),
+    path(
+        "api/v1/profiles/<str:username>/posts/",
+        api.profile_posts,
+        name="api_profile_posts",
+    ),
+    path("api/v1/follow/", api.follow_posts, name="api_follow"),
 ]
 
 if settings.DEBUG:
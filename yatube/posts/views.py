@@ -1,42 +1,82 @@
-from django.core.paginator import Paginator
+from urllib.parse import urlencode
+
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_POST
 from django.shortcuts import render, get_object_or_404, redirect
 from .models import Post, Group, User, Comment, Follow
 from django.contrib.auth.decorators import login_required
 from .forms import PostForm, CommentForm
-from django.views.decorators.cache import cache_page
+from . import follows
+from . import metrics as request_metrics
+from .budget import query_budget
+from .conditional import (
+    conditional_page,
+    group_state,
+    post_state,
+    profile_state,
+)
+from .fragments import render_feed, wants_fragment
+from .page_cache import cache_page_tagged, tag_request
+from .pagination import (
+    COMMENTS_PER_PAGE,
+    POSTS_PER_PAGE,
+    CommentPaginator,
+    paginate,
+)
+from .prerender import FULL_TEXT_FIELDS
+from .retry import retry_on_locked
+from .search import SearchPaginator
+from .thumbnails import schedule as schedule_thumbnails
+from .timeline import TimelinePaginator
 
 
-@cache_page(20)
+@query_budget(5)
+@cache_page_tagged()
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    return render(request, "index.html", {"page_obj": page})
+    tag_request(request, "index")
+    page = paginate(
+        request,
+        Post.objects.select_related("author", "group").defer(
+            *FULL_TEXT_FIELDS
+        ),
+    )
+    return render_feed(request, "index.html", {"page_obj": page})
 
 
+@query_budget(6)
+@cache_page_tagged()
+@conditional_page(group_state)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    return render(
+    tag_request(request, f"group:{group.id}")
+    page = paginate(
+        request,
+        group.posts.select_related("author").defer(*FULL_TEXT_FIELDS),
+    )
+    return render_feed(
         request, "group_list.html", {"group": group, "page_obj": page}
     )
 
 
+@query_budget(7)
+@cache_page_tagged()
+@conditional_page(profile_state)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    author_posts = author.posts.all()
-    paginator = Paginator(author_posts, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related("stats"), username=username
+    )
+    tag_request(request, f"author:{author.id}")
+    page = paginate(
+        request, author.posts.select_related("group").defer(*FULL_TEXT_FIELDS)
+    )
+    # Во фрагменте нет кнопки подписки.
     following = (
         request.user.is_authenticated
+        and not wants_fragment(request)
         and Follow.objects.filter(user=request.user, author=author).exists()
     )
-    return render(
+    return render_feed(
         request,
         "profile.html",
         {
@@ -47,23 +87,74 @@ def profile(request, username):
     )
 
 
+@query_budget(6)
+@cache_page_tagged()
+@conditional_page(post_state)
 def post_view(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related("author__stats", "group"), id=post_id
+    )
+    tag_request(request, f"post:{post.id}", f"author:{post.author_id}")
     author = post.author
-    post_list = author.posts.all()
-    post_count = post_list.count()
-    comments = Comment.objects.filter(post=post)
     form = CommentForm(request.POST or None)
     context = {
         "post": post,
-        "post_count": post_count,
         "author": author,
-        "comments": comments,
+        "comments": _comments_page(request, post),
         "form": form,
     }
     return render(request, "post.html", context)
 
 
+def _comments_page(request, post):
+    return paginate(
+        request,
+        Comment.objects.filter(post=post)
+        .select_related("author")
+        .order_by("created", "id"),
+        COMMENTS_PER_PAGE,
+        CommentPaginator,
+    )
+
+
+@query_budget(5)
+@cache_page_tagged()
+@conditional_page(post_state)
+def post_comments(request, post_id):
+    """Следующая порция комментариев HTML-фрагментом для «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only("id"), id=post_id)
+    tag_request(request, f"post:{post.id}")
+    return render(
+        request,
+        "includes/comment_list.html",
+        {"post": post, "comments": _comments_page(request, post)},
+    )
+
+
+@query_budget(5)
+def search(request):
+    query = request.GET.get("q", "").strip()
+    page = None
+    if query:
+        paginator = SearchPaginator(
+            Post.objects.select_related("author", "group").defer(
+                *FULL_TEXT_FIELDS
+            ),
+            POSTS_PER_PAGE,
+            query=query,
+        )
+        page = paginator.get_cursor_page(
+            after=request.GET.get("after"), before=request.GET.get("before")
+        )
+    context = {
+        "query": query,
+        "page_obj": page,
+        "page_query": urlencode({"q": query}),
+    }
+    return render(request, "search.html", context)
+
+
+@query_budget(10)
 @login_required
 def create(request):
     if request.method == "POST":
@@ -72,12 +163,14 @@ def create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            schedule_thumbnails(post)
             return redirect("profile", request.user.username)
         return render(request, "new_post.html", {"form": form, "value": "new"})
     form = PostForm()
     return render(request, "new_post.html", {"form": form, "value": "new"})
 
 
+@query_budget(8)
 @login_required
 def post_edit(request, post_id):
     post_object = get_object_or_404(Post, id=post_id)
@@ -88,11 +181,15 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if "image" in form.changed_data:
+            schedule_thumbnails(post_object)
         return redirect("post", post_id=post_id)
     return render(request, "new_post.html", {"form": form, "value": "edit"})
 
 
+@query_budget(8)
 @login_required
+@retry_on_locked
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -113,42 +210,72 @@ def server_error(request):
     return render(request, "misc/500.html", status=500)
 
 
+def metrics(request):
+    if not request_metrics.allowed(request):
+        raise PermissionDenied
+    return HttpResponse(
+        request_metrics.render(), content_type=request_metrics.CONTENT_TYPE
+    )
+
+
 def permission_denied(request, exception):
     return render(request, "misc/403.html", status=403)
 
 
+@query_budget(6)
 @login_required
 def follow_index(request):
-    posts_list = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related("group")
-    paginator = Paginator(posts_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    posts_list = (
+        Post.objects.filter(author__following__user=request.user)
+        .select_related("author", "group")
+        .defer(*FULL_TEXT_FIELDS)
+    )
+    page = paginate(
+        request,
+        posts_list,
+        paginator_class=TimelinePaginator,
+        user=request.user,
+    )
     context = {
         "page_obj": page,
     }
-    return render(request, "follow.html", context)
+    return render_feed(request, "follow.html", context)
 
 
+@query_budget(7)
 @login_required
+@retry_on_locked
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    if (
-        Follow.objects.filter(author=author, user=request.user).exists()
-        or request.user == author
-    ):
-        return redirect("profile", username=username)
-    Follow.objects.create(author=author, user=request.user)
-
+    authors = User.objects.filter(username=username)
+    if not follows.follow(request.user.id, authors):
+        # Уже подписан или это он сам; или автора нет - тогда 404.
+        get_object_or_404(authors)
     return redirect("profile", username=username)
 
 
+@query_budget(7)
 @login_required
+@retry_on_locked
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    follow_qs = Follow.objects.filter(author=author, user=request.user)
-    if follow_qs.exists():
-        follow_qs.delete()
-
+    authors = User.objects.filter(username=username)
+    if not follows.unfollow(request.user.id, authors):
+        get_object_or_404(authors)
     return redirect("profile", username=username)
+
+
+@query_budget(11)
+@require_POST
+@login_required
+@retry_on_locked
+def follow_bulk(request):
+    """Подписки (``follow``) и отписки (``unfollow``) списком имён в
+    одной транзакции; отвечает числом затронутых авторов."""
+    to_follow = request.POST.getlist("follow")
+    to_unfollow = request.POST.getlist("unfollow")
+    if max(len(to_follow), len(to_unfollow)) > follows.BATCH_SIZE:
+        return JsonResponse(
+            {"error": f"Не больше {follows.BATCH_SIZE} имён за запрос"},
+            status=400,
+        )
+    done = follows.apply(request.user.id, to_follow, to_unfollow)
+    return JsonResponse({key: len(ids) for key, ids in done.items()})
@@ -0,0 +1,342 @@
+"""Двухуровневый кеш: LRU в памяти процесса перед общим файлом SQLite.
+
+L1 - ограниченный ``OrderedDict`` в каждом воркере, L2 - файл SQLite
+в режиме WAL, общий для всех воркеров на хосте. Каждая запись в L2
+добавляет строку в журнал ``changes`` и публикует её номер в 8-байтовом
+счётчике поколения, отображённом в память (mmap) из соседнего файла.
+Чтение сверяет счётчик с последним увиденным номером - это обращение к
+памяти без системных вызовов - и только если он сдвинулся, читает из
+журнала изменённые ключи и выбрасывает их из L1.
+
+Пример настройки::
+
+    CACHES = {
+        "default": {
+            "BACKEND": "yatube.cache.TwoTierCache",
+            "LOCATION": "/var/tmp/yatube-cache.sqlite3",
+            "OPTIONS": {"MAX_ENTRIES": 100000, "L1_MAX_ENTRIES": 1000},
+        }
+    }
+"""
+import mmap
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+GENERATION = struct.Struct("q")
+# Ключ в журнале изменений, означающий clear().
+CLEAR_ALL = "*"
+# Сколько последних изменений хранить в журнале. Воркер, отставший
+# сильнее, просто очищает свой L1 целиком.
+CHANGES_KEPT = 10000
+# SQLite ограничивает число параметров в запросе.
+MAX_PARAMS = 500
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache ("
+    " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)",
+    "CREATE TABLE IF NOT EXISTS changes ("
+    " seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL)",
+)
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._path = location
+        self._l1_max_entries = int(options.get("L1_MAX_ENTRIES", 1000))
+        self._l1 = OrderedDict()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._generation = None
+        self._pid = None
+        self._seen = 0
+        self._writes = 0
+
+    # Соединения и счётчик поколения
+
+    def _connect(self):
+        """Соединение с L2 для текущего потока (и процесса - после fork)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _generation_map(self):
+        with self._lock:
+            if self._generation is not None and self._pid == os.getpid():
+                return self._generation
+            fd = os.open(self._path + "-gen", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < GENERATION.size:
+                    os.ftruncate(fd, GENERATION.size)
+                self._generation = mmap.mmap(fd, GENERATION.size)
+            finally:
+                os.close(fd)
+            self._pid = os.getpid()
+            # L1 нового процесса пуст, догонять журнал ему не нужно.
+            self._l1.clear()
+            self._seen = GENERATION.unpack_from(self._generation)[0]
+            return self._generation
+
+    def _sync(self):
+        """Выбросить из L1 ключи, изменённые другими воркерами."""
+        generation = GENERATION.unpack_from(self._generation_map())[0]
+        if generation == self._seen:
+            return
+        if generation - self._seen > CHANGES_KEPT:
+            self._l1.clear()
+            self._seen = generation
+            return
+        rows = (
+            self._connect()
+            .execute(
+                "SELECT seq, key FROM changes WHERE seq > ? ORDER BY seq",
+                (self._seen,),
+            )
+            .fetchall()
+        )
+        for seq, key in rows:
+            if key == CLEAR_ALL:
+                self._l1.clear()
+            else:
+                self._l1.pop(key, None)
+            self._seen = seq
+
+    def _write(self, keys, apply):
+        """Выполнить ``apply(conn)`` в транзакции и опубликовать изменения."""
+        conn = self._connect()
+        generation = self._generation_map()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = apply(conn)
+            conn.executemany(
+                "INSERT INTO changes (key) VALUES (?)", [(k,) for k in keys]
+            )
+            seq = conn.execute("SELECT max(seq) FROM changes").fetchone()[0]
+            # Публикуем, пока держим блокировку записи: так счётчик
+            # не может уменьшиться из-за гонки двух писателей.
+            GENERATION.pack_into(generation, 0, seq)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+            if CLEAR_ALL in keys:
+                self._l1.clear()
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._cull()
+        return result
+
+    # L1
+
+    def _remember(self, key, blob, expires, seen):
+        with self._lock:
+            if self._seen != seen:
+                # Пока читали L2, журнал мог сообщить об изменении этого
+                # ключа; прочитанное значение в L1 не кладём.
+                return
+            self._l1[key] = (blob, expires)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_get(self, key, now):
+        entry = self._l1.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= now:
+            del self._l1[key]
+            return None
+        self._l1.move_to_end(key)
+        return entry
+
+    def _fetch(self, keys):
+        """Найти ключи: сначала в L1, остальные - одним запросом к L2."""
+        now = time.time()
+        found = {}
+        with self._lock:
+            self._sync()
+            seen = self._seen
+            for key in keys:
+                entry = self._l1_get(key, now)
+                if entry is not None:
+                    found[key] = entry[0]
+        missing = [key for key in keys if key not in found]
+        conn = self._connect()
+        for start in range(0, len(missing), MAX_PARAMS):
+            chunk = missing[start:start + MAX_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = conn.execute(
+                "SELECT key, value, expires FROM cache "
+                f"WHERE key IN ({placeholders})",
+                chunk,
+            )
+            for key, blob, expires in rows:
+                if expires is None or expires > now:
+                    found[key] = blob
+                    self._remember(key, blob, expires, seen)
+        return found
+
+    # API кеша Django
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        blob = self._fetch([key]).get(key)
+        return default if blob is None else pickle.loads(blob)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        found = self._fetch(list(made))
+        return {made[key]: pickle.loads(blob) for key, blob in found.items()}
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key in self._fetch([key])
+
+    def _entries(self, data, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return [
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires)
+            for key, value in data.items()
+        ]
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        made = {}
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            made[key] = value
+        if not made:
+            return []
+        entries = self._entries(made, timeout)
+        self._write(
+            list(made),
+            lambda conn: conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires) "
+                "VALUES (?, ?, ?)",
+                entries,
+            ),
+        )
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        ((_, blob, expires),) = self._entries({key: value}, timeout)
+
+        def apply(conn):
+            row = conn.execute(
+                "SELECT expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and (row[0] is None or row[0] > time.time()):
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) "
+                "VALUES (?, ?, ?)",
+                (key, blob, expires),
+            )
+            return True
+
+        return self._write([key], apply)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expires = self.get_backend_timeout(timeout)
+        return self._write(
+            [key],
+            lambda conn: conn.execute(
+                "UPDATE cache SET expires = ? WHERE key = ? "
+                "AND (expires IS NULL OR expires > ?)",
+                (expires, key, time.time()),
+            ).rowcount
+            > 0,
+        )
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def apply(conn):
+            row = conn.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            conn.execute(
+                "UPDATE cache SET value = ? WHERE key = ?",
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key),
+            )
+            return value
+
+        return self._write([key], apply)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        made = [self.make_key(key, version=version) for key in keys]
+        for key in made:
+            self.validate_key(key)
+        if made:
+            self._write(
+                made,
+                lambda conn: conn.executemany(
+                    "DELETE FROM cache WHERE key = ?", [(k,) for k in made]
+                ),
+            )
+
+    def clear(self):
+        self._write(
+            [CLEAR_ALL], lambda conn: conn.execute("DELETE FROM cache")
+        )
+
+    def _cull(self):
+        """Удалить просроченное и лишнее из L2, подрезать журнал."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM cache WHERE expires <= ?", (time.time(),)
+            )
+            count = conn.execute("SELECT count(*) FROM cache").fetchone()[0]
+            if count > self._max_entries:
+                conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                    "ORDER BY expires IS NULL, expires LIMIT ?)",
+                    (count // self._cull_frequency,),
+                )
+            conn.execute(
+                "DELETE FROM changes WHERE seq <= "
+                "(SELECT max(seq) FROM changes) - ?",
+                (CHANGES_KEPT,),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
@@ -41,7 +41,7 @@ INSTALLED_APPS = [
     # наше приложение users**
     "users",
     # наше приложение posts**
-    "posts",
+    "posts.apps.PostsConfig",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -52,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "posts.metrics.MetricsMiddleware",
+    "posts.timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -59,14 +61,35 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "posts.budget.QueryBudgetMiddleware",
 ]
 
+# Проверять бюджет SQL-запросов представлений (см. posts/budget.py)
+QUERY_BUDGET_CHECK = DEBUG
+# Заголовок Server-Timing и строка в логгер posts.timing на каждый
+# запрос (posts/timing.py): время SQL, шаблонов, кеша и миниатюр.
+# Замер стоит микросекунды, его можно держать включённым и в продакшне.
+SERVER_TIMING = True
+# Метрики для Prometheus (posts/metrics.py): каждый воркер пишет в свой
+# файл в METRICS_DIR, /metrics/ их складывает. Сборщику нужен заголовок
+# "Authorization: Bearer <METRICS_TOKEN>"; пустой токен - только staff.
+# Без METRICS_DIR метрики не пишутся (так в тестах, yatube/test_runner.py).
+METRICS_DIR = os.path.join(BASE_DIR, "metrics")
+METRICS_TOKEN = ""
+
 ROOT_URLCONF = "yatube.urls"
 
+TEST_RUNNER = "yatube.test_runner.TestRunner"
+
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+# Без DEBUG Django сам оборачивает загрузчики в cached.Loader, и
+# разобранные шаблоны хранятся в памяти процесса; wsgi.py при старте
+# компилирует их все (posts/precompile.py): ошибки синтаксиса видны
+# сразу, а первые запросы не платят за разбор. С DEBUG шаблоны читаются
+# с диска на каждый запрос, чтобы правки были видны без перезапуска.
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "posts.timing.DjangoTemplates",
         "DIRS": [TEMPLATES_DIR],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -87,13 +110,39 @@ WSGI_APPLICATION = "yatube.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Соединение с SQLite настраивается PRAGMA при открытии (yatube/sqlite):
+# WAL - читатели не блокируют писателя и наоборот; писатель ждёт занятую
+# базу до busy_timeout мс, а не падает сразу с "database is locked".
+# Соединение живёт CONN_MAX_AGE секунд и переживает запросы.
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "yatube.sqlite",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        "CONN_MAX_AGE": 60,
+        "OPTIONS": {
+            # Блокировка записи берётся в начале транзакции: иначе
+            # транзакция, читавшая до записи, падает без ожидания.
+            "transaction_mode": "IMMEDIATE",
+            "pragmas": {
+                "busy_timeout": 5000,
+                "journal_mode": "WAL",
+                # В WAL достаточно: после сбоя питания теряются последние
+                # транзакции, но база остаётся целой.
+                "synchronous": "NORMAL",
+                # Страничный кеш на соединение, в КиБ (отрицательное).
+                "cache_size": -16000,
+                "mmap_size": 128 * 1024 * 1024,
+                "temp_store": "MEMORY",
+            },
+        },
     }
 }
 
+# Повторы записи, если база всё же занята (posts/retry.py): число
+# попыток и начальная пауза в секундах, дальше она удваивается.
+DB_RETRY_ATTEMPTS = 5
+DB_RETRY_BACKOFF = 0.05
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -154,8 +203,35 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+# В разработке и тестах кеш живёт в памяти процесса и пропадает вместе
+# с тестовой базой. В продакшене - двухуровневый кеш (yatube/cache.py):
+# LRU в памяти воркера перед SQLite-файлом, общим для всех воркеров хоста.
+if DEBUG:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
     }
-}
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "yatube.cache.TwoTierCache",
+            "LOCATION": os.path.join(BASE_DIR, "cache.sqlite3"),
+            "OPTIONS": {"MAX_ENTRIES": 100000, "L1_MAX_ENTRIES": 1000},
+        }
+    }
+
+# Время жизни страниц в кеше с тегами (posts/page_cache.py), секунды.
+# Новые посты, комментарии и подписки сбрасывают страницы сразу.
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Время жизни закешированных карточек постов, секунды
+POST_CARD_CACHE_TIMEOUT = 60 * 60
+
+# Лента подписок: посты авторов, у которых подписчиков больше этого
+# порога, не раскладываются по лентам, а подтягиваются при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Потоки, создающие миниатюры картинок в фоне (posts/thumbnails.py).
+# 0 - создавать сразу, в потоке запроса (так в тестах, yatube/test_runner.py).
+THUMBNAIL_WORKERS = 2
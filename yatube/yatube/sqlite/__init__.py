@@ -0,0 +1,24 @@
+"""Бэкенд SQLite с настройкой соединения через PRAGMA.
+
+Отличается от ``django.db.backends.sqlite3`` двумя ключами ``OPTIONS``:
+``pragmas`` - словарь PRAGMA, которые выполняются на каждом новом
+соединении, в порядке словаря, и ``transaction_mode`` - как начинать
+транзакции ``atomic()``: DEFERRED (по умолчанию), IMMEDIATE или
+EXCLUSIVE. Пример::
+
+    DATABASES = {
+        "default": {
+            "ENGINE": "yatube.sqlite",
+            "NAME": "db.sqlite3",
+            "CONN_MAX_AGE": 60,
+            "OPTIONS": {
+                "transaction_mode": "IMMEDIATE",
+                "pragmas": {
+                    "busy_timeout": 5000,
+                    "journal_mode": "WAL",
+                    "synchronous": "NORMAL",
+                },
+            },
+        }
+    }
+"""
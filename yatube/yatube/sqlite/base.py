@@ -0,0 +1,48 @@
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+NAME = re.compile(r"^[a-z_]+$")
+VALUE = re.compile(r"^(-?\d+|[A-Za-z_]+)$")
+TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+
+
+def pragma_statements(pragmas):
+    """``PRAGMA name = value`` для каждой пары; имена и значения
+    проверяются, потому что подставляются в SQL как есть."""
+    statements = []
+    for name, value in pragmas.items():
+        if not NAME.match(name) or not VALUE.match(str(value)):
+            raise ImproperlyConfigured(
+                f"Недопустимая PRAGMA в OPTIONS: {name} = {value!r}"
+            )
+        statements.append(f"PRAGMA {name} = {value}")
+    return statements
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = pragma_statements(kwargs.pop("pragmas", {}))
+        mode = kwargs.pop("transaction_mode", "DEFERRED").upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"Недопустимый transaction_mode в OPTIONS: {mode!r}"
+            )
+        self.transaction_mode = mode
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for statement in self.pragmas:
+            conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # Отложенная (DEFERRED) транзакция, которая сначала читает, а
+        # потом пишет, не ждёт busy_timeout: если после её чтения базу
+        # изменил другой писатель, запись сразу падает с "database is
+        # locked". IMMEDIATE берёт блокировку записи в BEGIN, и там
+        # busy_timeout работает.
+        self.cursor().execute(f"BEGIN {self.transaction_mode}")
@@ -0,0 +1,26 @@
+"""Тестовые значения настроек для ``manage.py test`` и pytest.
+
+Сами настройки от способа запуска не зависят; тесты подменяют их здесь
+(``TestRunner``) и в ``conftest.py`` в корне репозитория.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_SETTINGS = {
+    # Поток пула миниатюр пережил бы тест и писал бы в базу и
+    # MEDIA_ROOT, пока их очищают: в тестах миниатюры создаются сразу.
+    "THUMBNAIL_WORKERS": 0,
+    # MetricsMiddleware писал бы файлы воркеров в каталог проекта.
+    "METRICS_DIR": None,
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(**TEST_SETTINGS)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
 
 application = get_wsgi_application()
+
+# Приложения загружены - теперь можно импортировать их модули.
+from posts import precompile  # noqa: E402
+
+# Все шаблоны разбираются до первого запроса: ошибка в шаблоне не даёт
+# запуститься, а с кешируемыми загрузчиками (без DEBUG) разбор не
+# повторяется в запросах.
+precompile.compile_all()